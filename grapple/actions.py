@@ -9,6 +9,7 @@ import graphene
 from django.apps import apps
 from django.core.exceptions import FieldDoesNotExist
 from django.db import models
+from graphene.utils.str_converters import to_camel_case
 from graphene_django.types import DjangoObjectType
 from wagtail.blocks import StructValue, stream_block
 from wagtail.contrib.settings.models import BaseGenericSetting, BaseSiteSetting
@@ -20,15 +21,32 @@ from wagtail.models import Page as WagtailPage
 from wagtail.rich_text import RichText
 from wagtail.snippets.models import get_snippet_models
 
+from .embeds import prime_embeds
 from .helpers import field_middlewares, streamfield_types
 from .registry import registry
+from .renditions import prime_renditions
 from .settings import grapple_settings
 from .types.documents import DocumentObjectType
-from .types.images import ImageObjectType, ImageRenditionObjectType
+from .types.images import (
+    ImageObjectType,
+    ImageRefObjectType,
+    ImageRenditionObjectType,
+    get_instance_image_ref,
+)
 from .types.pages import Page, get_page_interface
 from .types.rich_text import RichText as RichTextType
+from .types.rich_text import (
+    prime_instance_rich_text,
+    prime_stream_rich_text,
+    render_request_rich_text,
+)
 from .types.snippets import get_snippet_interface
-from .types.streamfield import generate_streamfield_union
+from .types.streamfield import (
+    GenericStreamFieldInterface,
+    defer_list_blocks,
+    filter_stream_value,
+    generate_streamfield_union,
+)
 
 
 if apps.is_installed("wagtailmedia"):
@@ -170,6 +188,7 @@ def get_field_type(field):
         else:
             return field, graphene.Field(
                 field_type,
+                args=getattr(field, "field_args", None),
                 description=field.description,
                 deprecation_reason=field.deprecation_reason,
             )
@@ -220,12 +239,35 @@ def model_resolver(field):
         if callable(cls_field):
             return cls_field(info, **kwargs)
 
+        # Select StreamField blocks before they are decoded
+        if isinstance(cls_field, stream_block.StreamValue):
+            if kwargs:
+                cls_field = filter_stream_value(cls_field, **kwargs)
+            if (
+                getattr(field.field_type, "of_type", field.field_type)
+                is GenericStreamFieldInterface
+            ):
+                # Raw fields are serialized from the stored JSON, no block is used.
+                return cls_field
+            prime_embeds(info, cls_field)
+            prime_renditions(info, cls_field)
+            prime_stream_rich_text(info, cls_field)
+            return defer_list_blocks(cls_field)
+
+        # Image references are read along with the other images of the instance
+        if getattr(field.field_type, "of_type", field.field_type) is ImageRefObjectType:
+            return get_instance_image_ref(info, instance, cls_field)
+
         # Expand HTML if the value's field is richtext
         if field.field_type is RichTextType:
-            # Rendering of html will be handled by the GraphQL executor calling
-            # RichText.serialize, due to being declared as GraphQLRichText rather than
-            # GraphQLString
-            return cls_field
+            # Rendered along with the other rich text of the request. Other formats
+            # are handled by the GraphQL executor calling RichText.serialize, due to
+            # being declared as GraphQLRichText rather than GraphQLString
+            if isinstance(cls_field, RichText):
+                cls_field = cls_field.source
+            if isinstance(instance, models.Model):
+                prime_instance_rich_text(info, instance)
+            return render_request_rich_text(info, cls_field)
         try:
             if hasattr(instance._meta, "get_field"):
                 field_model = instance._meta.get_field(field.field_source)
@@ -235,7 +277,8 @@ def model_resolver(field):
             return cls_field
 
         if type(field_model) is RichTextField:
-            return RichTextType.serialize(cls_field)
+            prime_instance_rich_text(info, instance)
+            return RichTextType.serialize(render_request_rich_text(info, cls_field))
 
         # If none of those then just return field
         return cls_field
@@ -370,7 +413,13 @@ def get_field_value(instance, field_name: str):
     elif isinstance(instance.value, RichText):
         return RichTextType.serialize(instance.value.source)
     elif isinstance(instance.value, stream_block.StreamValue):
-        stream_data = dict(instance.value.stream_data)
+        # Build the lookup once per value, rather than once per field.
+        try:
+            stream_data = instance.value._grapple_stream_data
+        except AttributeError:
+            stream_data = instance.value._grapple_stream_data = dict(
+                instance.value.stream_data
+            )
         return stream_data[field_name]
     else:
         return instance.value[field_name]
@@ -406,9 +455,46 @@ def streamfield_resolver(self, instance, info, **kwargs):
         if issubclass(type(block), ImageChooserBlock) and isinstance(value, int):
             return block.to_python(value)
 
+    if kwargs:
+        value = filter_stream_value(value, **kwargs)
     return value
 
 
+def build_streamfield_resolver(cls: type, field_name: str):
+    """
+    Compile ``streamfield_resolver`` for one field of a block class: the child
+    block name and whether its integer values are image IDs to convert are
+    worked out once when the schema is built, rather than on every call.
+    """
+    graphql_name = (
+        to_camel_case(field_name) if grapple_settings.AUTO_CAMELCASE else field_name
+    )
+    child_name = convert_to_underscore(graphql_name)
+    base_block = getattr(cls, "base_blocks", {}).get(child_name)
+    if base_block is None:
+        # Not a declared child block, keep the generic behaviour.
+        return streamfield_resolver
+
+    converts_ids = isinstance(base_block, ImageChooserBlock)
+
+    def resolver(self, instance, info, **kwargs):
+        if not hasattr(instance, "block"):
+            return None
+
+        block = instance.block.child_blocks[child_name]
+        if not block:
+            return None
+
+        value = get_field_value(instance, child_name)
+        if converts_ids and isinstance(value, int):
+            return block.to_python(value)
+        if kwargs:
+            value = filter_stream_value(value, **kwargs)
+        return value
+
+    return resolver
+
+
 def custom_cls_resolver(*, cls, graphql_field):
     klass = cls()
 
@@ -489,10 +575,9 @@ def build_streamfield_type(
             field, field_type = get_field_type(item)
 
             # Add support for `graphql_fields`
-            methods[f"resolve_{field.field_name}"] = (
-                custom_cls_resolver(cls=cls, graphql_field=field)
-                or streamfield_resolver
-            )
+            methods[f"resolve_{field.field_name}"] = custom_cls_resolver(
+                cls=cls, graphql_field=field
+            ) or build_streamfield_resolver(cls, field.field_name)
 
             # Add field to GQL type with correct field-type
             type_meta[field.field_name] = field_type
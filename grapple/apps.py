@@ -10,8 +10,10 @@ class Grapple(AppConfig):
         in these apps and create graphql node types from them.
         """
         from .actions import import_apps, load_type_fields
+        from .signal_handlers import register_signal_handlers
         from .types.streamfield import register_streamfield_blocks
 
         import_apps()
         load_type_fields()
         register_streamfield_blocks()
+        register_signal_handlers()
@@ -0,0 +1,240 @@
+import hashlib
+import threading
+
+from collections import OrderedDict
+from time import monotonic
+from typing import Callable, Iterable, List, Optional, Tuple
+from uuid import uuid4
+
+from django.core.cache import cache, caches
+
+from .settings import grapple_settings
+
+
+def _version_key(name: str) -> str:
+    return f"grapple:{name}:version"
+
+
+# Version tokens last read by this process, with the time they were read.
+_local_versions = {}
+
+
+def get_cache_version(name: str) -> str:
+    """
+    Return the current version token of a named cache, shared between
+    processes through Django's default cache.
+
+    The token is kept in the process for ``CACHE_VERSION_TIMEOUT`` seconds, so
+    lookups don't all hit Django's cache. Invalidations made by other processes
+    are seen once it expires.
+    """
+    timeout = grapple_settings.CACHE_VERSION_TIMEOUT
+    if timeout and name in _local_versions:
+        version, read_at = _local_versions[name]
+        if monotonic() - read_at < timeout:
+            return version
+
+    key = _version_key(name)
+    version = cache.get(key)
+    if version is None:
+        # Never set, or evicted: start a new version so no process keeps stale data.
+        cache.add(key, uuid4().hex, None)
+        version = cache.get(key)
+    _local_versions[name] = (version, monotonic())
+    return version
+
+
+def bump_cache_version(name: str) -> None:
+    """
+    Invalidate every entry stored against the current version of a named cache.
+    """
+    version = uuid4().hex
+    cache.set(_version_key(name), version, None)
+    _local_versions[name] = (version, monotonic())
+
+
+class VersionedCache:
+    """
+    A process-local cache that is emptied whenever the shared version of the
+    named cache changes, so that invalidations made in one process are seen
+    by every process using the same cache backend.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._version = None
+        self._data = {}
+
+    def _get_data(self) -> dict:
+        version = get_cache_version(self.name)
+        if version != self._version:
+            with self._lock:
+                self._data = self._new_data()
+                self._version = version
+        return self._data
+
+    def _new_data(self) -> dict:
+        return {}
+
+    def get(self, key, default=None):
+        return self._get_data().get(key, default)
+
+    def set(self, key, value) -> None:
+        self._get_data()[key] = value
+
+    def invalidate(self) -> None:
+        bump_cache_version(self.name)
+        with self._lock:
+            self._data = self._new_data()
+            self._version = None
+
+
+class SharedLRUCache(VersionedCache):
+    """
+    A bounded process-local cache, evicting the least recently used entries, in
+    front of Django's default cache. Both levels are invalidated together by
+    bumping the version of the named cache.
+
+    The size of the local cache is read from the ``max_size_setting`` Grapple setting.
+    """
+
+    def __init__(self, name: str, max_size_setting: str):
+        super().__init__(name)
+        self.max_size_setting = max_size_setting
+
+    def _new_data(self) -> OrderedDict:
+        return OrderedDict()
+
+    def _shared_key(self, key: str) -> str:
+        return f"grapple:{self.name}:{self._version}:{key}"
+
+    def get(self, key: str, default=None):
+        data = self._get_data()
+        with self._lock:
+            try:
+                data.move_to_end(key)
+                return data[key]
+            except KeyError:
+                pass
+
+        value = cache.get(self._shared_key(key))
+        if value is None:
+            return default
+        self._set_local(data, key, value)
+        return value
+
+    def set(self, key: str, value) -> None:
+        data = self._get_data()
+        cache.set(self._shared_key(key), value)
+        self._set_local(data, key, value)
+
+    def _set_local(self, data: OrderedDict, key: str, value) -> None:
+        with self._lock:
+            data[key] = value
+            data.move_to_end(key)
+            max_size = getattr(grapple_settings, self.max_size_setting)
+            while len(data) > max_size:
+                data.popitem(last=False)
+
+
+ROUTE_CACHE = "routes"
+
+
+def _route_key(scope: str, site_id: Optional[int], url_path: str) -> str:
+    # URL paths can be long or contain characters some cache backends reject.
+    digest = hashlib.sha256(f"{scope}|{site_id}|{url_path}".encode()).hexdigest()
+    return f"grapple:route:{get_cache_version(ROUTE_CACHE)}:{digest}"
+
+
+def get_cached_route(
+    scope: str, site_id: Optional[int], url_path: str
+) -> Optional[Tuple[int, int]]:
+    """
+    Return the ``(page ID, content type ID)`` pair stored for a URL path, if any.
+    """
+    return cache.get(_route_key(scope, site_id, url_path))
+
+
+def set_cached_route(
+    scope: str,
+    site_id: Optional[int],
+    url_path: str,
+    page_id: int,
+    content_type_id: int,
+) -> None:
+    cache.set(_route_key(scope, site_id, url_path), (page_id, content_type_id), None)
+
+
+def set_cached_routes(
+    routes: Iterable[Tuple[str, Optional[int], str, int, int]],
+) -> None:
+    """
+    Store ``(scope, site ID, url path, page ID, content type ID)`` routes in bulk.
+    """
+    cache.set_many(
+        {
+            _route_key(scope, site_id, url_path): (page_id, content_type_id)
+            for scope, site_id, url_path, page_id, content_type_id in routes
+        },
+        None,
+    )
+
+
+def invalidate_routes() -> None:
+    bump_cache_version(ROUTE_CACHE)
+
+
+def _storage_key(storage) -> str:
+    try:
+        path, args, kwargs = storage.deconstruct()
+    except AttributeError:
+        return f"{type(storage).__module__}.{type(storage).__qualname__}"
+    return f"{path}|{args!r}|{sorted(kwargs.items())!r}"
+
+
+def _media_url_key(kind: str, item) -> Optional[str]:
+    file = getattr(item, "file", None)
+    if not file:
+        return None
+    file_hash = getattr(item, "file_hash", "")
+    # URLs may come from a serve view addressing the item, e.g. for documents, so
+    # items sharing a file don't share their URL.
+    item_key = f"{type(item).__module__}.{type(item).__qualname__}:{item.pk}"
+    file_key = f"{_storage_key(file.storage)}|{file.name}|{file_hash}"
+    digest = hashlib.sha256(f"{kind}|{item_key}|{file_key}".encode()).hexdigest()
+    return f"grapple:media-url:{digest}"
+
+
+def get_cached_media_urls(
+    items: Iterable, get_url: Callable[[object], str], kind: str = "url"
+) -> List[str]:
+    """
+    Return ``get_url(item)`` for media items (images, renditions, documents or
+    media), cached in the ``MEDIA_URL_CACHE`` cache for ``MEDIA_URL_CACHE_TIMEOUT``
+    seconds. URLs are keyed by item, storage, file name and file hash, so a replaced
+    file gets a new URL. ``kind`` tells apart the URLs computed differently for a
+    file.
+    """
+    items = list(items)
+    timeout = grapple_settings.MEDIA_URL_CACHE_TIMEOUT
+    if not timeout:
+        return [get_url(item) for item in items]
+
+    url_cache = caches[grapple_settings.MEDIA_URL_CACHE]
+    keys = [_media_url_key(kind, item) for item in items]
+    cached = url_cache.get_many([key for key in keys if key is not None])
+
+    urls = []
+    missing = {}
+    for item, key in zip(items, keys):
+        url = cached.get(key) if key is not None else None
+        if url is None:
+            url = get_url(item)
+            if key is not None:
+                missing[key] = url
+        urls.append(url)
+
+    if missing:
+        url_cache.set_many(missing, timeout)
+    return urls
@@ -0,0 +1,152 @@
+import threading
+
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import suppress
+from typing import Dict, Iterable, Iterator, Optional
+
+from django.utils import timezone
+from wagtail.embeds.blocks import EmbedBlock
+from wagtail.embeds.embeds import get_embed, get_embed_hash
+from wagtail.embeds.exceptions import EmbedException, EmbedUnsupportedProviderException
+from wagtail.embeds.finders import get_finders
+from wagtail.embeds.models import Embed
+
+from .settings import grapple_settings
+from .utils import block_contains, get_request_cache, iter_raw_block_values
+
+
+def collect_embed_urls(block, value) -> Iterator[str]:
+    """
+    Yield the URLs of the embed blocks found in the raw (JSON) data of a block,
+    without converting any of it to Python values.
+    """
+    for url in iter_raw_block_values(block, value, EmbedBlock):
+        if url and isinstance(url, str):
+            yield url
+
+
+def find_embed_data(url: str) -> Optional[dict]:
+    """
+    Ask the configured finders for the embed data of a URL, without touching the database.
+    """
+    try:
+        for finder in get_finders():
+            if finder.accept(url):
+                return finder.find_embed(url)
+        raise EmbedUnsupportedProviderException
+    except EmbedException:
+        return None
+
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def get_embed_executor() -> ThreadPoolExecutor:
+    """
+    Return the thread pool shared by all requests to call embed providers, with
+    ``EMBED_FETCH_WORKERS`` threads.
+    """
+    max_workers = grapple_settings.EMBED_FETCH_WORKERS
+    with _executors_lock:
+        try:
+            return _executors[max_workers]
+        except KeyError:
+            return _executors.setdefault(
+                max_workers,
+                ThreadPoolExecutor(
+                    max_workers=max_workers, thread_name_prefix="grapple-embeds"
+                ),
+            )
+
+
+def fetch_embeds(urls: Iterable[str]) -> Dict[str, Optional[Embed]]:
+    """
+    Fetch embeds missing from the database from their providers concurrently.
+
+    Providers are called from a thread pool shared by all requests, so the number of
+    threads stays bounded however many requests fetch embeds. URLs whose provider
+    does not answer within ``EMBED_FETCH_TIMEOUT`` seconds get no embed, and their
+    calls are cancelled if they haven't started yet. Successful results are stored
+    in the database from the calling thread, as ``get_embed`` would.
+    """
+    urls = list(urls)
+    embeds = dict.fromkeys(urls)
+    if not urls:
+        return embeds
+
+    executor = get_embed_executor()
+    futures = {executor.submit(find_embed_data, url): url for url in urls}
+    done, not_done = wait(futures, timeout=grapple_settings.EMBED_FETCH_TIMEOUT)
+    for future in not_done:
+        # Calls already running finish in the pool, and their results are discarded.
+        future.cancel()
+
+    for future in done:
+        url = futures[future]
+        embed_data = future.result()
+        if embed_data is None:
+            continue
+        with suppress(EmbedException):
+            embeds[url] = get_embed(
+                url, finder=lambda *args, embed_data=embed_data, **kwargs: embed_data
+            )
+
+    return embeds
+
+
+class EmbedLoader:
+    """
+    Load the embeds used in a GraphQL request in batches.
+
+    URLs collected from StreamField values are queued with ``prime()``. The first
+    ``get()`` loads every queued URL at once: the matching ``Embed`` rows in one
+    query, then the misses from their providers with ``fetch_embeds()``.
+    """
+
+    def __init__(self):
+        self._embeds: Dict[str, Optional[Embed]] = {}
+        self._pending = set()
+
+    def prime(self, urls: Iterable[str]) -> None:
+        self._pending.update(url for url in urls if url not in self._embeds)
+
+    def get(self, url: str) -> Optional[Embed]:
+        if url not in self._embeds:
+            self._pending.add(url)
+            self._load()
+        return self._embeds[url]
+
+    def _load(self) -> None:
+        urls, self._pending = self._pending, set()
+
+        hashes = {get_embed_hash(url): url for url in urls}
+        cached = Embed.objects.exclude(cache_until__lte=timezone.now()).filter(
+            hash__in=hashes
+        )
+        for embed in cached:
+            self._embeds[hashes[embed.hash]] = embed
+
+        self._embeds.update(
+            fetch_embeds(url for url in urls if url not in self._embeds)
+        )
+
+
+def get_embed_loader(info) -> EmbedLoader:
+    cache = get_request_cache(info, "embeds")
+    try:
+        return cache["loader"]
+    except KeyError:
+        cache["loader"] = EmbedLoader()
+        return cache["loader"]
+
+
+def prime_embeds(info, stream_value) -> None:
+    """
+    Queue the embed URLs of a StreamValue, so they are loaded along with the
+    first embed resolved in the request.
+    """
+    if block_contains(stream_value.stream_block, EmbedBlock):
+        get_embed_loader(info).prime(
+            collect_embed_urls(stream_value.stream_block, list(stream_value.raw_data))
+        )
@@ -72,7 +72,7 @@ def register_query_field(
     middleware=None,
 ):
     from .types.structures import QuerySetList
-    from .utils import resolve_queryset
+    from .utils import get_page_by_url_path, resolve_queryset
 
     if not plural_field_name:
         plural_field_name = field_name + "s"
@@ -116,11 +116,12 @@ def register_query_field(
                         qs = cls.objects.live().public()
                         url_path = kwargs.pop("url_path", None)
                         if url_path:
-                            if not url_path.endswith("/"):
-                                url_path += "/"
-                            return qs.filter(
-                                url_path__endswith=url_path, **kwargs
-                            ).first()
+                            return get_page_by_url_path(
+                                qs.filter(**kwargs),
+                                url_path,
+                                # Routes are only cached for plain URL path lookups.
+                                scope=None if kwargs else cls._meta.label_lower,
+                            )
 
                         return qs.get(**kwargs)
 
@@ -193,7 +194,7 @@ def register_paginated_query_field(
     middleware=None,
 ):
     from .types.structures import PaginatedQuerySet
-    from .utils import resolve_paginated_queryset
+    from .utils import get_page_by_url_path, resolve_paginated_queryset
 
     if not plural_field_name:
         plural_field_name = field_name + "s"
@@ -237,11 +238,12 @@ def register_paginated_query_field(
                         qs = cls.objects.live().public()
                         url_path = kwargs.pop("url_path", None)
                         if url_path:
-                            if not url_path.endswith("/"):
-                                url_path += "/"
-                            return qs.filter(
-                                url_path__endswith=url_path, **kwargs
-                            ).first()
+                            return get_page_by_url_path(
+                                qs.filter(**kwargs),
+                                url_path,
+                                # Routes are only cached for plain URL path lookups.
+                                scope=None if kwargs else cls._meta.label_lower,
+                            )
                         return qs.get(**kwargs)
 
                     return cls.objects.get(**kwargs)
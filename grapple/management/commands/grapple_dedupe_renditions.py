@@ -0,0 +1,75 @@
+from itertools import groupby
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from wagtail.images import get_image_model
+
+from ...renditions import canonical_filter_spec
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete the renditions whose filter spec only differs from another rendition "
+        "of the same image by the order of its operations, and store the remaining "
+        "ones under their canonical filter spec."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report the renditions that would be deleted or renamed.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="The number of renditions deleted at once.",
+        )
+
+    def handle(self, *args, dry_run, batch_size, **options):
+        rendition_model = get_image_model().get_rendition_model()
+        rows = (
+            rendition_model.objects.order_by("image_id", "focal_point_key", "pk")
+            .values_list("pk", "image_id", "focal_point_key", "filter_spec")
+            .iterator()
+        )
+
+        to_delete = []
+        to_rename = {}
+        for _key, renditions in groupby(rows, key=lambda row: row[1:3]):
+            equivalents = {}
+            for pk, _image_id, _focal_point_key, filter_spec in renditions:
+                equivalents.setdefault(canonical_filter_spec(filter_spec), []).append(
+                    (pk, filter_spec)
+                )
+
+            for canonical, specs in equivalents.items():
+                # Keep the rendition already using the canonical spec, or the oldest.
+                kept_pk, kept_spec = next(
+                    ((pk, spec) for pk, spec in specs if spec == canonical), specs[0]
+                )
+                if kept_spec != canonical:
+                    to_rename[kept_pk] = canonical
+                to_delete.extend(pk for pk, _spec in specs if pk != kept_pk)
+
+        if dry_run:
+            self.stdout.write(
+                f"Would delete {len(to_delete)} duplicate renditions "
+                f"and rename {len(to_rename)}."
+            )
+            return
+
+        with transaction.atomic():
+            # Deleted through the ORM, so Wagtail removes their files and cache entries.
+            for start in range(0, len(to_delete), batch_size):
+                rendition_model.objects.filter(
+                    pk__in=to_delete[start : start + batch_size]
+                ).delete()
+            for pk, filter_spec in to_rename.items():
+                rendition_model.objects.filter(pk=pk).update(filter_spec=filter_spec)
+
+        self.stdout.write(
+            f"Deleted {len(to_delete)} duplicate renditions "
+            f"and renamed {len(to_rename)}."
+        )
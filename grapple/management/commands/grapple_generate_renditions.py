@@ -0,0 +1,170 @@
+import json
+import os
+
+from multiprocessing import get_context
+from typing import Iterator, List
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connections
+from django.utils.dateparse import parse_datetime
+from graphene.utils.str_converters import to_snake_case
+from graphql import FieldNode, GraphQLError, parse, visit
+from graphql.language import Visitor
+from graphql.utilities import value_from_ast_untyped
+from wagtail.images import get_image_model
+
+from ...renditions import (
+    RENDITION_FIELDS,
+    canonical_filter_spec,
+    generate_image_renditions,
+    get_field_filter_specs,
+    setup_worker,
+)
+from ...settings import grapple_settings
+
+
+def _generate_in_worker(args):
+    close_old_connections()
+    try:
+        return generate_image_renditions(*args)
+    finally:
+        close_old_connections()
+
+
+class RenditionSpecCollector(Visitor):
+    """
+    Collect the filter specs of the ``rendition``, ``srcSet`` and ``imageSources``
+    fields of a GraphQL document. Fields with arguments given as variables are
+    skipped, as their values are only known when the operation is run.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.filter_specs = []
+
+    def enter_field(self, node: FieldNode, *args):
+        name = to_snake_case(node.name.value)
+        if name not in RENDITION_FIELDS:
+            return
+
+        arguments = {}
+        for argument in node.arguments:
+            value = value_from_ast_untyped(argument.value)
+            if not _is_literal(value):
+                return
+            arguments[to_snake_case(argument.name.value)] = value
+        self.filter_specs.extend(get_field_filter_specs(name, arguments))
+
+
+def _is_literal(value) -> bool:
+    # value_from_ast_untyped returns Undefined for variables, and None for nulls.
+    if isinstance(value, list):
+        return all(_is_literal(item) for item in value)
+    return isinstance(value, (str, int, float, bool))
+
+
+def iter_manifest_documents(manifest) -> Iterator[str]:
+    """
+    Yield the GraphQL documents of a persisted operation manifest: a list of
+    documents, a mapping of IDs to documents, or an ``{"operations": [...]}``
+    manifest with a ``body`` per operation.
+    """
+    if isinstance(manifest, dict) and isinstance(manifest.get("operations"), list):
+        manifest = manifest["operations"]
+    if isinstance(manifest, dict):
+        manifest = manifest.values()
+
+    for operation in manifest:
+        if isinstance(operation, dict):
+            operation = operation.get("body") or operation.get("query")
+        if isinstance(operation, str):
+            yield operation
+
+
+def collect_manifest_specs(manifest) -> List[str]:
+    collector = RenditionSpecCollector()
+    for document in iter_manifest_documents(manifest):
+        visit(parse(document), collector)
+    return collector.filter_specs
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate the missing renditions of all images, or of the images created "
+        "since a given time, for the filter specs used by the frontend."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--spec",
+            action="append",
+            dest="specs",
+            default=[],
+            help="A filter spec to generate, e.g. fill-300x150. Can be repeated.",
+        )
+        parser.add_argument(
+            "--manifest",
+            help=(
+                "A persisted operation manifest (JSON). The literal arguments of its "
+                "rendition and srcSet fields are used as filter specs."
+            ),
+        )
+        parser.add_argument(
+            "--since",
+            help="Only use the images created since this ISO 8601 date and time.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="The number of worker processes, or 0 to use this process.",
+        )
+
+    def get_filter_specs(self, specs, manifest_path) -> List[str]:
+        specs = [*specs, *grapple_settings.PREGENERATE_RENDITION_SPECS]
+        if manifest_path:
+            try:
+                with open(manifest_path) as manifest_file:
+                    specs.extend(collect_manifest_specs(json.load(manifest_file)))
+            except (OSError, ValueError, GraphQLError) as e:
+                raise CommandError(f"Could not read the manifest: {e}") from e
+
+        return list(dict.fromkeys(canonical_filter_spec(spec) for spec in specs))
+
+    def handle(self, *args, specs, manifest, since, workers, **options):
+        filter_specs = self.get_filter_specs(specs, manifest)
+        if not filter_specs:
+            raise CommandError(
+                "No filter specs. Use --spec, --manifest or "
+                "GRAPPLE['PREGENERATE_RENDITION_SPECS']."
+            )
+
+        images = get_image_model().objects.order_by("pk")
+        if since:
+            since_datetime = parse_datetime(since)
+            if since_datetime is None:
+                raise CommandError(f"Invalid --since date and time: {since}")
+            images = images.filter(created_at__gte=since_datetime)
+
+        tasks = [
+            (image_id, filter_specs)
+            for image_id in images.values_list("pk", flat=True).iterator()
+        ]
+        self.stdout.write(
+            f"Generating {len(filter_specs)} renditions for {len(tasks)} images."
+        )
+
+        if workers > 0:
+            # Workers are spawned and set up with their own database connections,
+            # which must not be shared with this process.
+            connections.close_all()
+            with get_context("spawn").Pool(workers, initializer=setup_worker) as pool:
+                generated = sum(
+                    pool.imap_unordered(_generate_in_worker, tasks, chunksize=10)
+                )
+        else:
+            generated = sum(
+                generate_image_renditions(image_id, specs) for image_id, specs in tasks
+            )
+
+        self.stdout.write(f"Generated {generated} renditions.")
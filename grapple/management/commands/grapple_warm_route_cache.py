@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand
+from wagtail.models import Page, Site
+
+from ...cache import set_cached_routes
+from ...settings import grapple_settings
+
+
+class Command(BaseCommand):
+    help = "Store the URL path routes of all live, public pages in the route cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--site",
+            action="append",
+            dest="hostnames",
+            default=[],
+            help="Only warm the routes of the site with this hostname. Can be repeated.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="The number of routes stored in the cache at once.",
+        )
+
+    def handle(self, *args, hostnames, batch_size, **options):
+        if not grapple_settings.ROUTE_CACHE:
+            self.stderr.write(
+                "The route cache is disabled. Set GRAPPLE['ROUTE_CACHE'] = True to use it."
+            )
+            return
+
+        sites = Site.objects.select_related("root_page")
+        if hostnames:
+            sites = sites.filter(hostname__in=hostnames)
+
+        total = 0
+        for site in sites:
+            # Routes are keyed on the full URL path, which is how site-scoped
+            # page(urlPath:) lookups are resolved. Lookups without a site match
+            # URL path suffixes, and are cached as they happen.
+            rows = (
+                Page.objects.live()
+                .public()
+                .descendant_of(site.root_page, inclusive=True)
+                .values_list("pk", "content_type_id", "url_path")
+                .iterator(chunk_size=batch_size)
+            )
+            batch = []
+            for pk, content_type_id, url_path in rows:
+                batch.append(("", site.pk, url_path, pk, content_type_id))
+                if len(batch) >= batch_size:
+                    set_cached_routes(batch)
+                    total += len(batch)
+                    batch = []
+            if batch:
+                set_cached_routes(batch)
+                total += len(batch)
+
+        self.stdout.write(f"Warmed {total} routes.")
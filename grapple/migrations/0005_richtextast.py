@@ -0,0 +1,27 @@
+# Generated by Django 4.2.16 on 2026-10-19 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("grapple", "0004_delete_stubmodel"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RichTextAST",
+            fields=[
+                (
+                    "source_hash",
+                    models.CharField(max_length=64, primary_key=True, serialize=False),
+                ),
+                ("tree", models.JSONField()),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "verbose_name": "rich text AST",
+                "verbose_name_plural": "rich text ASTs",
+            },
+        ),
+    ]
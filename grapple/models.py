@@ -7,6 +7,9 @@ from django.apps import apps
 from .exceptions import IllegalDeprecation
 from .registry import registry
 
+# Imported here so Django registers the model with the grapple app.
+from .rich_text_ast import RichTextAST  # noqa: F401
+
 
 # Classes used to define what the Django field should look like in the GQL type
 class GraphQLField:
@@ -30,6 +33,8 @@ class GraphQLField:
         self.field_source = kwargs.get("source", field_name)
         self.description = kwargs.get("description", None)
         self.deprecation_reason = kwargs.get("deprecation_reason", None)
+        # Extra GraphQL arguments accepted by the field
+        self.field_args = {}
 
         # Add support for NonNull/required fields
         if required:
@@ -111,13 +116,28 @@ def GraphQLForeignKey(field_name, content_type, **kwargs):
 
 def GraphQLStreamfield(field_name: str, **kwargs):
     def Mixin():
-        from .types.streamfield import StreamFieldInterface
+        from .types.streamfield import (
+            GenericStreamFieldInterface,
+            StreamFieldInterface,
+            get_stream_value_args,
+        )
+
+        if kwargs.get("raw"):
+            # The stored JSON is returned as is, as a single value.
+            field = GraphQLField(
+                field_name, GenericStreamFieldInterface, **{**kwargs, "is_list": False}
+            )
+            field.field_args = get_stream_value_args()
+            return field
 
         # Note that GraphQLStreamfield children should always be considered list elements,
         # unless they specifically are requested not to. e.g. a GraphQLStreamfield for a nested StructBlock
         if "is_list" not in kwargs:
             kwargs["is_list"] = True
-        return GraphQLField(field_name, StreamFieldInterface, **kwargs)
+        field = GraphQLField(field_name, StreamFieldInterface, **kwargs)
+        if kwargs["is_list"]:
+            field.field_args = get_stream_value_args()
+        return field
 
     return Mixin
 
@@ -140,6 +160,19 @@ def GraphQLImage(field_name: str, **kwargs):
     return Mixin
 
 
+def GraphQLImageRef(field_name: str, **kwargs):
+    def Mixin():
+        from .types.images import ImageRefObjectType
+
+        # Resolved from the foreign key's column, without loading the image.
+        source = kwargs.get("source", field_name)
+        return GraphQLField(
+            field_name, ImageRefObjectType, **{**kwargs, "source": f"{source}_id"}
+        )
+
+    return Mixin
+
+
 def GraphQLDocument(field_name: str, **kwargs):
     def Mixin():
         from .types.documents import get_document_type
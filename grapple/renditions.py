@@ -0,0 +1,735 @@
+import re
+import threading
+
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from types import SimpleNamespace
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import close_old_connections, models
+from django.db.models.fields.files import FieldFile
+from django.dispatch import receiver
+from django.test.signals import setting_changed
+from django.urls import NoReverseMatch
+from django.utils.module_loading import import_string
+from graphene.utils.str_converters import to_snake_case
+from graphql import Undefined
+from graphql.utilities import value_from_ast_untyped
+from wagtail.images import get_image_model
+from wagtail.images.blocks import ImageChooserBlock
+from wagtail.images.models import Filter
+from wagtail.images.utils import to_svg_safe_spec
+from wagtail.images.views.serve import generate_image_url
+
+from .settings import grapple_settings
+from .utils import (
+    block_contains,
+    get_media_item_url,
+    get_media_item_urls,
+    get_request_cache,
+    iter_raw_block_values,
+    iter_selected_fields,
+)
+
+
+# The order of the operations in canonical filter specs: resizing first, then
+# output options. Operations missing from this list go last, in their given order.
+# Operations only changing how the output is encoded, so their order does not
+# change the rendition. Resizing and custom operations keep their given order.
+OUTPUT_OPERATION_ORDER = (
+    "format",
+    "bgcolor",
+    "jpegquality",
+    "webpquality",
+    "avifquality",
+)
+_OUTPUT_OPERATION_RANKS = {
+    name: rank for rank, name in enumerate(OUTPUT_OPERATION_ORDER, start=1)
+}
+
+
+def get_filter_operation(spec: str) -> str:
+    return spec.split("-", 1)[0]
+
+
+def canonical_filter_spec(filter_spec: str) -> str:
+    """
+    Return a filter spec with its output operations after the others, in a fixed
+    order, so that the same rendition arguments given in any order give the same
+    spec, and so the same rendition. Resizing operations are kept in their order,
+    as ``width-50|fill-100x100`` and ``fill-100x100|width-50`` differ.
+    """
+    operations = [spec for spec in filter_spec.split("|") if spec]
+    # The sort is stable, so operations of the same rank keep their order.
+    operations.sort(
+        key=lambda spec: _OUTPUT_OPERATION_RANKS.get(get_filter_operation(spec), 0)
+    )
+    return "|".join(operations)
+
+
+def build_filter_spec(operations: Iterable) -> str:
+    """
+    Build the canonical filter spec of ``(operation, value)`` pairs.
+    """
+    return canonical_filter_spec("|".join(f"{key}-{val}" for key, val in operations))
+
+
+class AllowedImageFilters:
+    """
+    The compiled ``ALLOWED_IMAGE_FILTERS`` setting.
+
+    Filter specs are allowed when they are listed, with their output operations in
+    any order, or when they match a rule. Rules are mappings of operations to their
+    allowed values, such as ``{"width": range(100, 2001, 100), "format": ["webp",
+    None]}``. A spec matches a rule when it only uses the rule's operations, with
+    allowed values. Operations are required unless ``None`` is one of their allowed
+    values, and ranges match integer values.
+    """
+
+    def __init__(self, allowed_filters: Iterable):
+        specs = set()
+        self.rules: List[Dict[str, Tuple[object, bool]]] = []
+        for allowed_filter in allowed_filters:
+            if isinstance(allowed_filter, str):
+                specs.add(canonical_filter_spec(allowed_filter))
+            elif isinstance(allowed_filter, dict):
+                self.rules.append(self._compile_rule(allowed_filter))
+            else:
+                raise ImproperlyConfigured(
+                    "ALLOWED_IMAGE_FILTERS items must be filter specs or rules "
+                    f"(dicts), not {allowed_filter!r}."
+                )
+        self.specs = frozenset(specs)
+
+    @staticmethod
+    def _compile_rule(rule: dict) -> Dict[str, Tuple[object, bool]]:
+        compiled = {}
+        for operation, values in rule.items():
+            if isinstance(values, range):
+                compiled[operation] = (values, False)
+            elif isinstance(values, (list, tuple, set, frozenset)):
+                compiled[operation] = (
+                    frozenset(str(value) for value in values if value is not None),
+                    None in values,
+                )
+            else:
+                raise ImproperlyConfigured(
+                    f"The allowed values of the '{operation}' operation of an "
+                    "ALLOWED_IMAGE_FILTERS rule must be a range or a list."
+                )
+        return compiled
+
+    def __contains__(self, filter_spec: str) -> bool:
+        filter_spec = canonical_filter_spec(filter_spec)
+        if filter_spec in self.specs:
+            return True
+        if not self.rules:
+            return False
+
+        operations = {}
+        for spec in filter_spec.split("|"):
+            operation, _, value = spec.partition("-")
+            if operation in operations:
+                return False
+            operations[operation] = value
+        return any(self._matches(rule, operations) for rule in self.rules)
+
+    @staticmethod
+    def _matches(rule: dict, operations: Dict[str, str]) -> bool:
+        for operation, (_values, optional) in rule.items():
+            if operation not in operations and not optional:
+                return False
+        for operation, value in operations.items():
+            try:
+                values, _optional = rule[operation]
+            except KeyError:
+                return False
+            if isinstance(values, range):
+                if not value.isdigit() or int(value) not in values:
+                    return False
+            elif value not in values:
+                return False
+        return True
+
+
+_allowed_image_filters = {}
+
+
+def get_allowed_image_filters() -> Optional[AllowedImageFilters]:
+    """
+    Return the compiled ``ALLOWED_IMAGE_FILTERS`` setting, or ``None`` when all
+    filters are allowed. It is compiled once, and again when settings change.
+    """
+    try:
+        return _allowed_image_filters["compiled"]
+    except KeyError:
+        pass
+
+    allowed_filters = grapple_settings.ALLOWED_IMAGE_FILTERS
+    if allowed_filters is None or not isinstance(allowed_filters, (list, tuple)):
+        compiled = None
+    else:
+        compiled = AllowedImageFilters(allowed_filters)
+    return _allowed_image_filters.setdefault("compiled", compiled)
+
+
+@receiver(setting_changed)
+def reset_allowed_image_filters(*, setting, **kwargs):
+    if setting == "GRAPPLE":
+        _allowed_image_filters.clear()
+
+
+# The image fields using renditions, by their snake case names.
+RENDITION_FIELDS = ("rendition", "src_set", "image_sources")
+
+FILL_RATIO_RE = re.compile(r"^(\d+)x(\d+)$")
+
+
+def build_image_source_specs(
+    widths: Iterable[int], formats: Iterable = (), fill: Optional[str] = None
+) -> List[Tuple[Optional[str], int, str]]:
+    """
+    Return the ``(format, width, filter spec)`` of each source of a responsive image
+    set. ``fill`` is an aspect ratio, e.g. ``16x9``, to crop the image to.
+    """
+    ratio = None
+    if fill:
+        match = FILL_RATIO_RE.match(fill)
+        if match is None or not all(int(part) for part in match.groups()):
+            raise TypeError("Invalid fill ratio. Use `<width>x<height>`, e.g. `16x9`.")
+        ratio = int(match[2]) / int(match[1])
+
+    sources = []
+    for format in dict.fromkeys(formats or [None]):
+        for width in dict.fromkeys(widths):
+            if ratio is None:
+                operations = {"width": width}
+            else:
+                operations = {"fill": f"{width}x{max(round(width * ratio), 1)}"}
+            if format:
+                operations["format"] = format
+            sources.append((format, width, build_filter_spec(operations.items())))
+    return sources
+
+
+def get_field_filter_specs(field_name: str, arguments: dict) -> List[str]:
+    """
+    Return the filter specs used by a ``rendition``, ``src_set`` or
+    ``image_sources`` image field given its arguments, keyed by their snake case
+    names.
+    """
+    arguments = {
+        key: value for key, value in arguments.items() if key != "preserve_svg"
+    }
+    if field_name == "rendition":
+        return [build_filter_spec(arguments.items())] if arguments else []
+    if field_name == "image_sources":
+        return [
+            filter_spec
+            for _format, _width, filter_spec in build_image_source_specs(
+                arguments.get("widths") or [],
+                arguments.get("formats") or [],
+                arguments.get("fill"),
+            )
+        ]
+
+    format_argument = {"format": arguments["format"]} if arguments.get("format") else {}
+    return [
+        build_filter_spec({"width": width, **format_argument}.items())
+        for width in arguments.get("sizes") or []
+    ]
+
+
+def get_selected_filter_specs(info) -> List[str]:
+    """
+    Return the filter specs of the ``rendition``, ``srcSet`` and ``imageSources``
+    fields selected on the images being resolved, along with their SVG-safe
+    variants.
+    """
+    filter_specs = {}
+    for field in iter_selected_fields(info):
+        field_name = to_snake_case(field.name.value)
+        if field_name not in RENDITION_FIELDS:
+            continue
+
+        arguments = {}
+        for argument in field.arguments:
+            value = value_from_ast_untyped(argument.value, info.variable_values)
+            if value is not None and value is not Undefined:
+                arguments[to_snake_case(argument.name.value)] = value
+
+        for filter_spec in get_field_filter_specs(field_name, arguments):
+            filter_specs[filter_spec] = None
+            filter_specs[to_svg_safe_spec(filter_spec) or "original"] = None
+    return list(filter_specs)
+
+
+def has_prefetched_renditions(image) -> bool:
+    # Wagtail's prefetch_renditions() stores them in "prefetched_renditions".
+    return hasattr(image, "prefetched_renditions") or "renditions" in getattr(
+        image, "_prefetched_objects_cache", {}
+    )
+
+
+def get_pending_rendition_url(image, filter_spec: str) -> str:
+    """
+    Return the URL of a rendition served by Wagtail's image serve view, which
+    generates it on demand, or the URL of the original image if the view isn't
+    routed.
+    """
+    try:
+        url = generate_image_url(image, filter_spec)
+    except NoReverseMatch:
+        return get_media_item_url(image)
+
+    if url[0] == "/":
+        return getattr(settings, "BASE_URL", "") + url
+    return url
+
+
+def get_pending_rendition(image, rendition_filter: Filter):
+    """
+    Queue the generation of a missing rendition with the configured backend, and
+    return an unsaved rendition standing for it until it is generated. Its size is
+    worked out from the filter, without opening the source image.
+    """
+    get_rendition_backend().enqueue(image.pk, rendition_filter.spec)
+
+    width, height = rendition_filter.get_transform(image).size
+    rendition = get_image_model().get_rendition_model()(
+        image=image,
+        filter_spec=rendition_filter.spec,
+        focal_point_key=rendition_filter.get_cache_key(image),
+        width=width,
+        height=height,
+    )
+    rendition.grapple_pending_url = get_pending_rendition_url(
+        image, rendition_filter.spec
+    )
+    return rendition
+
+
+def is_pending_rendition(rendition) -> bool:
+    return getattr(rendition, "grapple_pending_url", None) is not None
+
+
+def get_rendition_url(rendition) -> str:
+    return get_rendition_urls([rendition])[0]
+
+
+def get_rendition_urls(renditions: Iterable) -> List[str]:
+    renditions = list(renditions)
+    stored_urls = iter(
+        get_media_item_urls(
+            rendition for rendition in renditions if not is_pending_rendition(rendition)
+        )
+    )
+    return [
+        rendition.grapple_pending_url
+        if is_pending_rendition(rendition)
+        else next(stored_urls)
+        for rendition in renditions
+    ]
+
+
+class RenditionLoader:
+    """
+    Load the renditions used in a GraphQL request in batches.
+
+    Image IDs found while resolving a StreamField are queued with ``prime()``. The
+    first ``get()`` for a filter spec fetches the renditions of every queued image
+    for that spec with one query. Only the renditions missing from the database are
+    then generated, or queued for generation when ``RENDITION_ASYNC`` is enabled.
+
+    Images with prefetched renditions, as returned by the ``images`` query, are
+    served from their prefetched renditions.
+    """
+
+    def __init__(self):
+        self._pending: Set[int] = set()
+        self._loaded: Dict[str, Set[int]] = {}
+        # Renditions keyed by (image ID, filter spec), then by focal point key.
+        self._renditions: Dict[Tuple[int, str], dict] = {}
+
+    def prime(self, image_ids: Iterable[int]) -> None:
+        self._pending.update(image_id for image_id in image_ids if image_id)
+
+    def get(self, image, filter_spec: str):
+        return self.get_many(image, [filter_spec])[filter_spec]
+
+    def get_many(self, image, filter_specs: Iterable[str]) -> Dict[str, object]:
+        """
+        Return the renditions of an image for several filter specs, keyed by spec.
+
+        Existing renditions are looked up with one query for all the specs and all
+        the queued images, and the missing ones are generated by Wagtail in a single
+        pass over the source image.
+        """
+        filter_specs = list(dict.fromkeys(filter_specs))
+        if not filter_specs:
+            # Wagtail's get_renditions() fails without specs.
+            return {}
+        if has_prefetched_renditions(image):
+            if not grapple_settings.RENDITION_ASYNC:
+                return image.get_renditions(*filter_specs)
+            found = {
+                rendition_filter.spec: rendition
+                for rendition_filter, rendition in image.find_existing_renditions(
+                    *(Filter(spec=filter_spec) for filter_spec in filter_specs)
+                ).items()
+            }
+        else:
+            found = self._find(image, filter_specs)
+
+        missing = [spec for spec in filter_specs if spec not in found]
+        if missing:
+            # True misses, generated by Wagtail or queued.
+            if grapple_settings.RENDITION_ASYNC:
+                generated = {
+                    filter_spec: get_pending_rendition(image, Filter(spec=filter_spec))
+                    for filter_spec in missing
+                }
+            else:
+                generated = image.get_renditions(*missing)
+
+            for filter_spec, rendition in generated.items():
+                self._renditions.setdefault((image.pk, filter_spec), {})[
+                    rendition.focal_point_key
+                ] = rendition
+                found[filter_spec] = rendition
+
+        for rendition in found.values():
+            # Avoid a query when the rendition's image is used, e.g. for its alt text.
+            rendition.image = image
+        return found
+
+    def _find(self, image, filter_specs: List[str]) -> Dict[str, object]:
+        self._load_many(
+            [
+                filter_spec
+                for filter_spec in filter_specs
+                if image.pk not in self._loaded.get(filter_spec, ())
+            ],
+            {image.pk},
+        )
+
+        found = {}
+        for filter_spec in filter_specs:
+            focal_point_key = Filter(spec=filter_spec).get_cache_key(image)
+            renditions = self._renditions.get((image.pk, filter_spec), {})
+            if focal_point_key in renditions:
+                found[filter_spec] = renditions[focal_point_key]
+        return found
+
+    def _load_many(self, filter_specs: Iterable[str], image_ids: Set[int]) -> None:
+        filter_specs = list(filter_specs)
+        if not filter_specs:
+            return
+
+        loaded = [self._loaded.setdefault(spec, set()) for spec in filter_specs]
+        # Images loaded for some of the specs only are loaded again for all of
+        # them, to keep to a single query.
+        image_ids = (image_ids | self._pending) - set.intersection(*loaded)
+        for loaded_ids in loaded:
+            loaded_ids.update(image_ids)
+
+        rendition_model = get_image_model().get_rendition_model()
+        for rendition in rendition_model.objects.filter(
+            image_id__in=image_ids, filter_spec__in=filter_specs
+        ):
+            self._renditions.setdefault(
+                (rendition.image_id, rendition.filter_spec), {}
+            )[rendition.focal_point_key] = rendition
+
+
+def get_rendition_loader(info) -> RenditionLoader:
+    cache = get_request_cache(info, "renditions")
+    try:
+        return cache["loader"]
+    except KeyError:
+        cache["loader"] = RenditionLoader()
+        return cache["loader"]
+
+
+# The image columns read for image references.
+IMAGE_REF_FIELDS = (
+    "id",
+    "title",
+    "file",
+    "width",
+    "height",
+    "focal_point_x",
+    "focal_point_y",
+    "focal_point_width",
+    "focal_point_height",
+)
+
+
+class ImageRefLoader:
+    """
+    Load compact image references, the ``values()`` rows of images, and the URLs of
+    their renditions in batches, without instantiating models.
+
+    Rows are added with ``add()``, or queued by image ID with ``prime()`` and read
+    with one query on the first ``get()``. The first ``get_rendition_url()`` for a
+    filter spec looks up the renditions of every known image for that spec with one
+    query, matching them on the focal point key worked out from the rows. Only the
+    images missing the rendition are loaded, with one query, to generate it as the
+    ``rendition`` field would.
+    """
+
+    def __init__(self, rendition_loader: RenditionLoader):
+        self.rendition_loader = rendition_loader
+        self._rows: Dict[int, Optional[dict]] = {}
+        self._pending: Set[int] = set()
+        self._loaded: Dict[str, Set[int]] = {}
+        self._urls: Dict[Tuple[int, str], str] = {}
+
+    def add(self, rows: Iterable[dict]) -> List[dict]:
+        rows = list(rows)
+        for row in rows:
+            self._rows[row["id"]] = row
+        return rows
+
+    def prime(self, image_ids: Iterable[int]) -> None:
+        self._pending.update(
+            image_id
+            for image_id in image_ids
+            if image_id and image_id not in self._rows
+        )
+
+    def get(self, image_id: int) -> Optional[dict]:
+        if image_id not in self._rows:
+            self._pending.add(image_id)
+            self._load_rows()
+        return self._rows[image_id]
+
+    def _load_rows(self) -> None:
+        image_ids, self._pending = self._pending, set()
+        rows = {
+            row["id"]: row
+            for row in get_image_model()
+            .objects.filter(pk__in=image_ids)
+            .values(*IMAGE_REF_FIELDS)
+        }
+        for image_id in image_ids:
+            self._rows[image_id] = rows.get(image_id)
+
+    def get_rendition_url(self, image_id: int, filter_spec: str) -> Optional[str]:
+        if (image_id, filter_spec) not in self._urls:
+            self.get(image_id)
+            self._load_rendition_urls(filter_spec)
+        return self._urls.get((image_id, filter_spec))
+
+    def _load_rendition_urls(self, filter_spec: str) -> None:
+        if self._pending:
+            self._load_rows()
+
+        loaded = self._loaded.setdefault(filter_spec, set())
+        rendition_filter = Filter(spec=filter_spec)
+        focal_point_keys = {
+            image_id: rendition_filter.get_cache_key(SimpleNamespace(**row))
+            for image_id, row in self._rows.items()
+            if row is not None and image_id not in loaded
+        }
+        loaded.update(focal_point_keys)
+        if not focal_point_keys:
+            return
+
+        rendition_model = get_image_model().get_rendition_model()
+        files = {}
+        for image_id, focal_point_key, file_name in rendition_model.objects.filter(
+            image_id__in=focal_point_keys, filter_spec=filter_spec
+        ).values_list("image_id", "focal_point_key", "file"):
+            if focal_point_key == focal_point_keys[image_id]:
+                files[image_id] = file_name
+
+        file_field = rendition_model._meta.get_field("file")
+        urls = get_media_item_urls(
+            SimpleNamespace(file=FieldFile(None, file_field, file_name))
+            for file_name in files.values()
+        )
+        for image_id, url in zip(files, urls):
+            self._urls[(image_id, filter_spec)] = url
+
+        missing = [image_id for image_id in focal_point_keys if image_id not in files]
+        if missing:
+            images = get_image_model().objects.in_bulk(missing)
+            # Look their renditions up with one query, before generating them.
+            self.rendition_loader.prime(images)
+            renditions = [
+                self.rendition_loader.get(image, filter_spec)
+                for image in images.values()
+            ]
+            for image_id, url in zip(images, get_rendition_urls(renditions)):
+                self._urls[(image_id, filter_spec)] = url
+
+
+def get_image_ref_loader(info) -> ImageRefLoader:
+    cache = get_request_cache(info, "image_refs")
+    try:
+        return cache["loader"]
+    except KeyError:
+        cache["loader"] = ImageRefLoader(get_rendition_loader(info))
+        return cache["loader"]
+
+
+_image_foreign_keys: Dict[type, Tuple[str, ...]] = {}
+
+
+def get_image_foreign_keys(model) -> Tuple[str, ...]:
+    """
+    Return the attribute names of the image foreign keys of a model.
+    """
+    try:
+        return _image_foreign_keys[model]
+    except KeyError:
+        image_model = get_image_model()
+        return _image_foreign_keys.setdefault(
+            model,
+            tuple(
+                field.attname
+                for field in model._meta.concrete_fields
+                if isinstance(field, models.ForeignKey)
+                and field.related_model is image_model
+            ),
+        )
+
+
+def prime_image_refs(info, instances: Iterable) -> None:
+    """
+    Queue the images of the image foreign keys of model instances, so the image
+    references of a list of objects are read with one query, along with the first
+    one resolved.
+    """
+    image_ids = [
+        getattr(instance, attname)
+        for instance in instances
+        if isinstance(instance, models.Model)
+        for attname in get_image_foreign_keys(type(instance))
+    ]
+    if image_ids:
+        get_image_ref_loader(info).prime(image_ids)
+
+
+def prime_renditions(info, stream_value) -> None:
+    """
+    Queue the images of the image chooser blocks of a StreamValue, so their
+    renditions are loaded along with the first rendition resolved in the request.
+    """
+    if block_contains(stream_value.stream_block, ImageChooserBlock):
+        get_rendition_loader(info).prime(
+            image_id
+            for image_id in iter_raw_block_values(
+                stream_value.stream_block,
+                list(stream_value.raw_data),
+                ImageChooserBlock,
+            )
+            if isinstance(image_id, int)
+        )
+
+
+def generate_rendition(image_id: int, filter_spec: str) -> None:
+    """
+    Generate a rendition, unless it exists already. Run by rendition backends.
+    """
+    image_model = get_image_model()
+    close_old_connections()
+    try:
+        image_model.objects.get(pk=image_id).get_rendition(filter_spec)
+    except image_model.DoesNotExist:
+        pass
+    finally:
+        close_old_connections()
+
+
+def generate_image_renditions(image_id: int, filter_specs: Iterable[str]) -> int:
+    """
+    Generate the missing renditions of an image in one pass over its source file,
+    and return how many were generated.
+    """
+    from .types.images import get_image_filter_spec
+
+    image_model = get_image_model()
+    try:
+        image = image_model.objects.get(pk=image_id)
+    except image_model.DoesNotExist:
+        return 0
+
+    filter_specs = dict.fromkeys(
+        get_image_filter_spec(image, filter_spec) for filter_spec in filter_specs
+    )
+    filters = [Filter(spec=filter_spec) for filter_spec in filter_specs]
+    existing = image.find_existing_renditions(*filters)
+    missing = [
+        rendition_filter.spec
+        for rendition_filter in filters
+        if rendition_filter not in existing
+    ]
+    if missing:
+        image.get_renditions(*missing)
+    return len(missing)
+
+
+def setup_worker() -> None:
+    """
+    Set Django up in a worker process started with the "spawn" method.
+    """
+    import django
+
+    django.setup()
+
+
+class ProcessPoolRenditionBackend:
+    """
+    Generate renditions in a bounded pool of worker processes, started with the
+    "spawn" method and set up with ``django.setup()``, so each worker has its own
+    database connections. Renditions already queued are not queued again, and at
+    most ``RENDITION_ASYNC_QUEUE_SIZE`` renditions wait for the workers: the others
+    are dropped, to be queued by a later request.
+
+    Backends are set with the ``RENDITION_ASYNC_BACKEND`` setting. Any class with an
+    ``enqueue(image_id, filter_spec)`` method can be used, for example to hand the
+    work over to a task queue calling ``generate_rendition()``.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor = None
+        self._queued = set()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=grapple_settings.RENDITION_ASYNC_WORKERS,
+                mp_context=get_context("spawn"),
+                initializer=setup_worker,
+            )
+        return self._executor
+
+    def enqueue(self, image_id: int, filter_spec: str) -> None:
+        key = (image_id, filter_spec)
+        with self._lock:
+            if (
+                key in self._queued
+                or len(self._queued) >= grapple_settings.RENDITION_ASYNC_QUEUE_SIZE
+            ):
+                return
+            self._queued.add(key)
+            future = self._get_executor().submit(
+                generate_rendition, image_id, filter_spec
+            )
+        future.add_done_callback(lambda _future: self._queued.discard(key))
+
+
+_rendition_backends = {}
+
+
+def get_rendition_backend():
+    path = grapple_settings.RENDITION_ASYNC_BACKEND
+    try:
+        return _rendition_backends[path]
+    except KeyError:
+        return _rendition_backends.setdefault(path, import_string(path)())
@@ -0,0 +1,22 @@
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+
+class RichTextAST(models.Model):
+    """
+    The node tree of a rich text value, served when ``RICHTEXT_FORMAT`` is ``"ast"``.
+
+    Trees are keyed by a hash of the database representation of the rich text, so
+    values left unchanged between revisions share a single row.
+    """
+
+    source_hash = models.CharField(max_length=64, primary_key=True)
+    tree = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = _("rich text AST")
+        verbose_name_plural = _("rich text ASTs")
+
+    def __str__(self):
+        return self.source_hash
@@ -27,7 +27,24 @@ DEFAULTS = {
     "ADD_SEARCH_HIT": False,
     "PAGE_SIZE": 10,
     "MAX_PAGE_SIZE": 100,
+    "PAGE_INDEX_MAX_SIZE": 1000,
+    "MENU_TREE_CACHE": False,
+    "ROUTE_CACHE": False,
+    "SITE_CACHE": False,
+    "CACHE_VERSION_TIMEOUT": 1,
     "RICHTEXT_FORMAT": "html",
+    "RICHTEXT_CACHE": False,
+    "RICHTEXT_CACHE_SIZE": 1000,
+    "RICHTEXT_AST_STORE_ON_REQUEST": False,
+    "EMBED_FETCH_WORKERS": 4,
+    "EMBED_FETCH_TIMEOUT": 10,
+    "RENDITION_ASYNC": False,
+    "RENDITION_ASYNC_BACKEND": "grapple.renditions.ProcessPoolRenditionBackend",
+    "RENDITION_ASYNC_WORKERS": 2,
+    "RENDITION_ASYNC_QUEUE_SIZE": 100,
+    "PREGENERATE_RENDITION_SPECS": [],
+    "MEDIA_URL_CACHE": "default",
+    "MEDIA_URL_CACHE_TIMEOUT": None,
     "PAGE_INTERFACE": "grapple.types.interfaces.PageInterface",
     "SNIPPET_INTERFACE": "grapple.types.interfaces.SnippetInterface",
 }
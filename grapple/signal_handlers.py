@@ -0,0 +1,98 @@
+from django.db.models.signals import post_delete, post_save
+from wagtail.documents import get_document_model
+from wagtail.images import get_image_model
+from wagtail.models import Page, PageViewRestriction, Site
+from wagtail.signals import page_published, page_unpublished, post_page_move
+
+from .cache import invalidate_routes
+from .settings import grapple_settings
+from .types.menus import menu_tree_cache
+from .types.rich_text import (
+    get_references_to,
+    invalidate_rich_text_trees,
+    rendered_rich_text_cache,
+    store_rich_text_trees,
+)
+from .utils import site_table
+
+
+def invalidate_rich_text_caches(instance):
+    """
+    Invalidate the rendered rich text when some content links to a page, image or
+    document that changed, as it contains their URLs.
+
+    Only the content recorded in Wagtail's reference index is looked up, so
+    uploading or editing media that no rich text uses keeps the caches.
+    """
+    cache_enabled = grapple_settings.RICHTEXT_CACHE
+    stores_trees = grapple_settings.RICHTEXT_FORMAT == "ast"
+    if not (cache_enabled or stores_trees):
+        return
+
+    references = get_references_to(instance)
+    if not references.exists():
+        return
+
+    if cache_enabled:
+        rendered_rich_text_cache.invalidate()
+    if stores_trees:
+        invalidate_rich_text_trees(references)
+
+
+def invalidate_page_tree_caches(**kwargs):
+    """
+    Invalidate the caches derived from the page tree, when a page is published,
+    unpublished, moved or deleted, or a view restriction changes.
+    """
+    menu_tree_cache.invalidate()
+    invalidate_routes()
+    # Root page URL paths are part of the site table.
+    site_table.invalidate()
+
+
+def invalidate_page_caches(instance, **kwargs):
+    invalidate_page_tree_caches()
+    # Rendered rich text contains page URLs.
+    invalidate_rich_text_caches(instance)
+
+
+def invalidate_site_caches(**kwargs):
+    site_table.invalidate()
+    invalidate_routes()
+    if grapple_settings.RICHTEXT_CACHE:
+        rendered_rich_text_cache.invalidate()
+    if grapple_settings.RICHTEXT_FORMAT == "ast":
+        invalidate_rich_text_trees()
+
+
+def invalidate_media_caches(instance, **kwargs):
+    """
+    Invalidate the caches containing image and document URLs.
+    """
+    invalidate_rich_text_caches(instance)
+
+
+def build_rich_text_trees(sender, instance, **kwargs):
+    """
+    Store the node trees of the rich text of a page when it is published, so
+    they are served without parsing.
+    """
+    if grapple_settings.RICHTEXT_FORMAT == "ast":
+        store_rich_text_trees(instance)
+
+
+def register_signal_handlers():
+    page_published.connect(invalidate_page_caches)
+    # After the invalidation, so trees are built with the new URLs.
+    page_published.connect(build_rich_text_trees)
+    page_unpublished.connect(invalidate_page_caches)
+    post_page_move.connect(invalidate_page_caches)
+    post_delete.connect(invalidate_page_caches, sender=Page)
+    post_save.connect(invalidate_page_tree_caches, sender=PageViewRestriction)
+    post_delete.connect(invalidate_page_tree_caches, sender=PageViewRestriction)
+    post_save.connect(invalidate_site_caches, sender=Site)
+    post_delete.connect(invalidate_site_caches, sender=Site)
+
+    for model in (get_image_model(), get_document_model()):
+        post_save.connect(invalidate_media_caches, sender=model)
+        post_delete.connect(invalidate_media_caches, sender=model)
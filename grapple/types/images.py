@@ -4,18 +4,32 @@ from typing import TYPE_CHECKING
 
 import graphene
 
+from graphene.types.resolver import dict_or_attr_resolver
 from graphene_django import DjangoObjectType
 from wagtail.images import get_image_model
 from wagtail.images.models import Image as WagtailImage
 from wagtail.images.models import Rendition as WagtailImageRendition
 from wagtail.images.utils import to_svg_safe_spec
 
+from grapple.cache import get_cached_media_urls
 from grapple.registry import registry
-from grapple.settings import grapple_settings
-from grapple.utils import get_media_item_url, resolve_queryset
+from grapple.renditions import (
+    IMAGE_REF_FIELDS,
+    build_filter_spec,
+    build_image_source_specs,
+    get_allowed_image_filters,
+    get_image_ref_loader,
+    get_rendition_loader,
+    get_rendition_url,
+    get_rendition_urls,
+    get_selected_filter_specs,
+    is_pending_rendition,
+    prime_image_refs,
+)
+from grapple.utils import get_media_item_url, pop_resolved_objects, resolve_queryset
 
 from .collections import CollectionObjectType
-from .structures import QuerySetList
+from .structures import PositiveInt, QuerySetList
 from .tags import TagObjectType
 
 
@@ -72,14 +86,34 @@ def get_src_set_field_kwargs() -> dict[str, graphene.Scalar]:
 
 
 def rendition_allowed(filter_specs: str) -> bool:
-    """Checks a given rendition filter is allowed"""
-    allowed_filters = grapple_settings.ALLOWED_IMAGE_FILTERS
-    if allowed_filters is None or not isinstance(allowed_filters, (list, tuple)):
+    """Checks a given rendition filter is allowed, in any output operation order"""
+    allowed_filters = get_allowed_image_filters()
+    if allowed_filters is None:
         return True
 
     return filter_specs in allowed_filters
 
 
+def get_image_filter_spec(
+    image: WagtailImage, filter_specs: str, *, preserve_svg: bool = True
+) -> str:
+    """Returns the filter spec to use for an image, limited to safe filters for SVGs"""
+    if image.is_svg() and preserve_svg:
+        # when dealing with SVGs, we want to limit the filter specs to those that are safe
+        filter_specs = to_svg_safe_spec(filter_specs)
+        if not filter_specs:
+            # if there are no valid filters, fall back to the original
+            filter_specs = "original"
+
+        if not filter_specs:
+            raise TypeError(
+                "No valid filter specs for SVG. "
+                "See https://docs.wagtail.org/en/stable/topics/images.html#svg-images for details."
+            )
+
+    return filter_specs
+
+
 class ImageRenditionObjectType(DjangoObjectType):
     id = graphene.ID(required=True)
     file = graphene.String(required=True)
@@ -92,14 +126,62 @@ class ImageRenditionObjectType(DjangoObjectType):
     url = graphene.String(required=True)
     alt = graphene.String(required=True)
     background_position_style = graphene.String(required=True)
+    pending = graphene.Boolean(
+        required=True,
+        description="Whether the rendition is still being generated, with `RENDITION_ASYNC`. "
+        "Its `url` is then served by Wagtail's image serve view, or the original image.",
+    )
 
     class Meta:
         model = WagtailImageRendition
 
+    def resolve_id(instance: WagtailImageRendition, info: GraphQLResolveInfo, **kwargs):
+        if instance.pk is None:
+            # Pending renditions aren't saved yet.
+            return f"{instance.image_id}:{instance.filter_spec}"
+        return instance.pk
+
     def resolve_url(
         instance: WagtailImageRendition, info: GraphQLResolveInfo, **kwargs
     ):
-        return instance.full_url
+        if is_pending_rendition(instance):
+            return get_rendition_url(instance)
+        return get_cached_media_urls(
+            [instance], lambda rendition: rendition.full_url, kind="full_url"
+        )[0]
+
+    def resolve_pending(
+        instance: WagtailImageRendition, info: GraphQLResolveInfo, **kwargs
+    ) -> bool:
+        return is_pending_rendition(instance)
+
+
+class ImageSourceObjectType(graphene.ObjectType):
+    """
+    A rendition of an image in a responsive image set.
+    """
+
+    format = graphene.String(
+        description="The requested format, or null for the format of the original."
+    )
+    size = graphene.Int(required=True, description="The requested width.")
+    width = graphene.Int(required=True)
+    height = graphene.Int(required=True)
+    url = graphene.String(required=True)
+
+
+def get_image_sources_field_kwargs() -> dict[str, graphene.Scalar]:
+    return {
+        "widths": graphene.List(graphene.NonNull(graphene.Int), required=True),
+        "formats": graphene.List(graphene.String),
+        "fill": graphene.String(
+            description="An aspect ratio, e.g. `16x9`, to crop the image to."
+        ),
+        "preserve_svg": graphene.Boolean(
+            description="Prevents raster image operations (e.g. `format-webp`, `bgcolor`, etc.) being applied to SVGs. "
+            "More info: https://docs.wagtail.org/en/stable/topics/images.html#svg-images"
+        ),
+    }
 
 
 class ImageObjectType(DjangoObjectType):
@@ -123,6 +205,11 @@ class ImageObjectType(DjangoObjectType):
     tags = graphene.List(graphene.NonNull(lambda: TagObjectType), required=True)
     rendition = graphene.Field(get_rendition_type, **get_rendition_field_kwargs())
     src_set = graphene.String(**get_src_set_field_kwargs())
+    image_sources = graphene.List(
+        graphene.NonNull(ImageSourceObjectType),
+        required=True,
+        **get_image_sources_field_kwargs(),
+    )
     is_svg = graphene.Boolean(required=True)
 
     class Meta:
@@ -135,7 +222,8 @@ class ImageObjectType(DjangoObjectType):
         Render a custom rendition of the current image.
         """
         preserve_svg = kwargs.pop("preserve_svg", True)
-        filter_specs = "|".join([f"{key}-{val}" for key, val in kwargs.items()])
+        # Canonical, so that argument order doesn't make another rendition.
+        filter_specs = build_filter_spec(kwargs.items())
 
         # Only allow the defined filters (thus renditions)
         if not rendition_allowed(filter_specs):
@@ -143,22 +231,14 @@ class ImageObjectType(DjangoObjectType):
                 "Invalid filter specs. Check the `ALLOWED_IMAGE_FILTERS` setting."
             )
 
-        if instance.is_svg() and preserve_svg:
-            # when dealing with SVGs, we want to limit the filter specs to those that are safe
-            filter_specs = to_svg_safe_spec(filter_specs)
-            if not filter_specs:
-                # if there are no valid filters, fall back to the original
-                filter_specs = "original"
-
-            if not filter_specs:
-                raise TypeError(
-                    "No valid filter specs for SVG. "
-                    "See https://docs.wagtail.org/en/stable/topics/images.html#svg-images for details."
-                )
+        filter_specs = get_image_filter_spec(
+            instance, filter_specs, preserve_svg=preserve_svg
+        )
 
         # previously we wrapped this in a try/except SourceImageIOError block.
         # Removed to allow the error to bubble up in the response ("errors") and be handled by the user.
-        return instance.get_rendition(filter_specs)
+        # Looked up along with the renditions of the other images of the request.
+        return get_rendition_loader(info).get(instance, filter_specs)
 
     def resolve_url(instance: WagtailImage, info: GraphQLResolveInfo, **kwargs) -> str:
         """
@@ -199,38 +279,189 @@ class ImageObjectType(DjangoObjectType):
     ) -> str:
         """
         Generate src set of renditions.
+
+        The renditions of all the sizes are fetched together, and the missing ones
+        generated in one pass over the source image.
         """
-        filter_suffix = f"|format-{format}" if format else ""
         format_kwarg = {"format": format} if format else {}
         if instance.file.name is not None:
-            rendition_list = [
-                ImageObjectType.resolve_rendition(
-                    instance,
-                    info,
-                    width=width,
-                    preserve_svg=preserve_svg,
-                    **format_kwarg,
-                )
+            filter_specs = [
+                build_filter_spec({"width": width, **format_kwarg}.items())
                 for width in sizes
-                if rendition_allowed(f"width-{width}{filter_suffix}")
             ]
+            filter_specs = [
+                get_image_filter_spec(instance, filter_spec, preserve_svg=preserve_svg)
+                for filter_spec in filter_specs
+                if rendition_allowed(filter_spec)
+            ]
+            renditions = get_rendition_loader(info).get_many(instance, filter_specs)
+            rendition_list = [
+                renditions[filter_spec]
+                for filter_spec in filter_specs
+                if renditions[filter_spec] is not None
+            ]
+            urls = get_rendition_urls(rendition_list)
 
             return ", ".join(
-                [
-                    f"{get_media_item_url(img)} {img.width}w"
-                    for img in rendition_list
-                    if img is not None
-                ]
+                [f"{url} {img.width}w" for url, img in zip(urls, rendition_list)]
             )
 
         return ""
 
+    def resolve_image_sources(
+        instance: WagtailImage,
+        info: GraphQLResolveInfo,
+        widths: list[int],
+        formats: list[str | None] | None = None,
+        fill: str | None = None,
+        *,
+        preserve_svg: bool = True,
+        **kwargs,
+    ) -> list[ImageSourceObjectType]:
+        """
+        Generate the renditions of a responsive image set, for each format and width.
+
+        The renditions are fetched together, and the missing ones generated in one
+        pass over the source image. SVGs get one source per width, as formats don't
+        apply to them.
+        """
+        if instance.file.name is None:
+            return []
+
+        if preserve_svg and instance.is_svg():
+            formats = None
+
+        sources = [
+            (
+                format,
+                width,
+                get_image_filter_spec(instance, filter_spec, preserve_svg=preserve_svg),
+            )
+            for format, width, filter_spec in build_image_source_specs(
+                widths, formats, fill
+            )
+            if rendition_allowed(filter_spec)
+        ]
+        if not sources:
+            return []
+
+        renditions = get_rendition_loader(info).get_many(
+            instance, [filter_spec for _format, _width, filter_spec in sources]
+        )
+        rendition_list = [renditions[filter_spec] for *_, filter_spec in sources]
+        urls = get_rendition_urls(rendition_list)
+
+        return [
+            ImageSourceObjectType(
+                format=format,
+                size=size,
+                width=rendition.width,
+                height=rendition.height,
+                url=url,
+            )
+            for (format, size, _filter_spec), rendition, url in zip(
+                sources, rendition_list, urls
+            )
+        ]
+
     def resolve_is_svg(
         instance: WagtailImage, info: GraphQLResolveInfo, **kwargs
     ) -> bool:
         return instance.is_svg()
 
 
+def is_svg_file(file_name: str) -> bool:
+    # As Image.is_svg(), from the file name only.
+    return file_name.lower().endswith(".svg")
+
+
+def get_image_ref(root, info) -> dict | None:
+    """
+    Return the row of an image reference, given as a row or as an image ID.
+    """
+    if isinstance(root, dict):
+        return root
+    return get_image_ref_loader(info).get(int(root))
+
+
+def get_instance_image_ref(info, instance, image_id: int | None) -> int | None:
+    """
+    Return the ID of an image referenced by a model instance, or None if the image
+    doesn't exist. The images of every image foreign key of the instance, and of
+    the other objects of its list, are read together, with one query.
+    """
+    if image_id is None:
+        return None
+
+    prime_image_refs(info, [instance, *pop_resolved_objects(info)])
+    loader = get_image_ref_loader(info)
+    return image_id if loader.get(image_id) is not None else None
+
+
+def image_ref_resolver(attname, default_value, root, info, **kwargs):
+    return dict_or_attr_resolver(
+        attname, default_value, get_image_ref(root, info), info, **kwargs
+    )
+
+
+class ImageRefObjectType(graphene.ObjectType):
+    """
+    A compact reference to an image, read from its database row without loading
+    the image, for lists of cards and image choosers.
+    """
+
+    id = graphene.ID(required=True)
+    title = graphene.String(required=True)
+    width = graphene.Int(required=True)
+    height = graphene.Int(required=True)
+    focal_point_x = graphene.Int()
+    focal_point_y = graphene.Int()
+    focal_point_width = graphene.Int()
+    focal_point_height = graphene.Int()
+    is_svg = graphene.Boolean(required=True)
+    rendition_url = graphene.String(**get_rendition_field_kwargs())
+
+    class Meta:
+        default_resolver = image_ref_resolver
+
+    def resolve_is_svg(root, info: GraphQLResolveInfo, **kwargs) -> bool:
+        return is_svg_file(get_image_ref(root, info)["file"])
+
+    def resolve_rendition_url(root, info: GraphQLResolveInfo, **kwargs) -> str | None:
+        """
+        The URL of a rendition, looked up along with the renditions of the other
+        image references of the request.
+        """
+        row = get_image_ref(root, info)
+        if row is None:
+            return None
+
+        preserve_svg = kwargs.pop("preserve_svg", True)
+        filter_spec = build_filter_spec(kwargs.items())
+        if not rendition_allowed(filter_spec):
+            raise TypeError(
+                "Invalid filter specs. Check the `ALLOWED_IMAGE_FILTERS` setting."
+            )
+
+        if preserve_svg and is_svg_file(row["file"]):
+            filter_spec = to_svg_safe_spec(filter_spec) or "original"
+        return get_image_ref_loader(info).get_rendition_url(row["id"], filter_spec)
+
+
+def get_public_images(info):
+    """
+    Return the images in public collections, with the renditions of the filter
+    specs selected in the query prefetched, if any.
+    """
+    images = get_image_model().objects.filter(
+        collection__view_restrictions__isnull=True
+    )
+    if filter_specs := get_selected_filter_specs(info):
+        # Only the selected renditions, rather than all the renditions of each image.
+        images = images.prefetch_renditions(*filter_specs)
+    return images
+
+
 def ImagesQuery():
     mdl = get_image_model()
     mdl_type = get_image_type()
@@ -246,26 +477,36 @@ def ImagesQuery():
             ),
         )
         image_type = graphene.String(required=True)
+        image_refs = graphene.List(
+            graphene.NonNull(ImageRefObjectType),
+            required=True,
+            ids=graphene.List(graphene.NonNull(graphene.ID)),
+            collection=graphene.Argument(
+                graphene.ID, description="Filter by collection id"
+            ),
+            limit=PositiveInt(),
+            offset=PositiveInt(),
+            order=graphene.String(),
+        )
 
         def resolve_image(parent, info, id, **kwargs):
             """Returns an image given the id, if in a public collection"""
             try:
-                return (
-                    mdl.objects.filter(collection__view_restrictions__isnull=True)
-                    .prefetch_renditions()
-                    .get(pk=id)
-                )
+                return get_public_images(info).get(pk=id)
             except mdl.DoesNotExist:
                 return None
 
         def resolve_images(parent, info, **kwargs):
             """Returns all images in a public collection"""
-            return resolve_queryset(
-                mdl.objects.filter(
-                    collection__view_restrictions__isnull=True
-                ).prefetch_renditions(),
-                info,
-                **kwargs,
+            return resolve_queryset(get_public_images(info), info, **kwargs)
+
+        def resolve_image_refs(parent, info, ids=None, **kwargs):
+            """Returns compact references to the images in a public collection"""
+            images = mdl.objects.filter(collection__view_restrictions__isnull=True)
+            if ids is not None:
+                images = images.filter(pk__in=ids)
+            return get_image_ref_loader(info).add(
+                resolve_queryset(images.values(*IMAGE_REF_FIELDS), info, **kwargs)
             )
 
         # Give name of the image type, used to generate mixins
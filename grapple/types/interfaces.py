@@ -11,7 +11,7 @@ from wagtail.rich_text import RichText
 
 from ..registry import registry
 from ..settings import grapple_settings
-from ..utils import resolve_queryset, serialize_struct_obj
+from ..utils import get_page_url_resolver, resolve_queryset, serialize_struct_obj
 from .structures import QuerySetList
 
 
@@ -99,6 +99,13 @@ class PageInterface(graphene.Interface):
     def resolve_page_type(self, info, **kwargs):
         return get_page_interface().resolve_type(self.specific, info, **kwargs)
 
+    def resolve_url(self, info, **kwargs):
+        """
+        Resolves the page URL, same as ``Page.url``, from the site root paths
+        shared by all pages in the current request.
+        """
+        return get_page_url_resolver(info).get_page_url(self)
+
     def resolve_parent(self, info, **kwargs):
         """
         Resolves the parent node of current page node.
@@ -182,6 +189,32 @@ class PageInterface(graphene.Interface):
         return getattr(self, "search_score", None)
 
 
+# Block class -> GraphQL type, precomputed by register_streamfield_blocks() for
+# every block reachable from a model StreamField, and memoized for any other class.
+streamfield_block_types = {}
+
+
+def get_streamfield_block_type(block_class):
+    """
+    Return the GraphQL type registered for the block class or its closest
+    registered ancestor, falling back to the generic block type.
+    """
+    try:
+        return streamfield_block_types[block_class]
+    except KeyError:
+        pass
+
+    for klass in inspect.getmro(block_class):
+        if klass in registry.streamfield_blocks:
+            graphql_type = registry.streamfield_blocks[klass]
+            break
+    else:
+        graphql_type = registry.streamfield_blocks["generic-block"]
+
+    streamfield_block_types[block_class] = graphql_type
+    return graphql_type
+
+
 class StreamFieldInterface(graphene.Interface):
     id = graphene.String()
     block_type = graphene.String(required=True)
@@ -195,13 +228,7 @@ class StreamFieldInterface(graphene.Interface):
         otherwise use generic block type.
         """
         if hasattr(instance, "block"):
-            mdl = type(instance.block)
-            if mdl in registry.streamfield_blocks:
-                return registry.streamfield_blocks[mdl]
-
-            for block_class in inspect.getmro(mdl):
-                if block_class in registry.streamfield_blocks:
-                    return registry.streamfield_blocks[block_class]
+            return get_streamfield_block_type(type(instance.block))
 
         return registry.streamfield_blocks["generic-block"]
 
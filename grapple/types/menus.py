@@ -0,0 +1,170 @@
+import graphene
+
+from django.utils.translation import get_language
+from django.utils.translation import gettext_lazy as _
+from wagtail.models import Page as WagtailPage
+
+from ..cache import VersionedCache
+from ..settings import grapple_settings
+from ..utils import find_site_for_request, get_default_site, get_page_url_resolver
+from .pages import get_site_filter
+from .structures import PositiveInt
+
+
+# Menu trees keyed by (root page ID, depth, in_menu, site ID, language), shared between
+# requests and invalidated whenever pages are published, unpublished, moved or deleted.
+menu_tree_cache = VersionedCache("menu-tree")
+
+
+class MenuItemObjectType(graphene.ObjectType):
+    """
+    A live page in a menu tree, built from database rows without instantiating the page.
+    """
+
+    id = graphene.ID(required=True)
+    title = graphene.String(required=True)
+    slug = graphene.String(required=True)
+    url_path = graphene.String(required=True)
+    url = graphene.String()
+    depth = graphene.Int(required=True)
+    show_in_menus = graphene.Boolean(required=True)
+    children = graphene.List(
+        graphene.NonNull(lambda: MenuItemObjectType), required=True
+    )
+
+
+def build_menu_tree(root: WagtailPage, depth: int, info, *, in_menu=None, site=None):
+    """
+    Fetch the live, public descendants of ``root`` up to ``depth`` levels in one
+    query and nest them using their treebeard paths.
+
+    When ``in_menu`` is set, pages are filtered on ``show_in_menus`` and the
+    descendants of excluded pages are left out.
+    """
+    pages = (
+        WagtailPage.objects.live()
+        .public()
+        .filter(
+            path__startswith=root.path,
+            depth__gt=root.depth,
+            depth__lte=root.depth + depth,
+        )
+    )
+    if in_menu is not None:
+        pages = pages.in_menu() if in_menu else pages.not_in_menu()
+
+    rows = list(
+        pages.order_by("path").values_list(
+            "pk",
+            "content_type_id",
+            "url_path",
+            "path",
+            "depth",
+            "title",
+            "slug",
+            "show_in_menus",
+        )
+    )
+    urls = get_page_url_resolver(info, site).get_urls(
+        (pk, content_type_id, url_path)
+        for pk, content_type_id, url_path, *_rest in rows
+    )
+
+    items_by_path = {}
+    tree = []
+    for (pk, _content_type_id, url_path, path, depth, title, slug, show), url in zip(
+        rows, urls
+    ):
+        item = {
+            "id": pk,
+            "title": title,
+            "slug": slug,
+            "url_path": url_path,
+            "url": url,
+            "depth": depth,
+            "show_in_menus": show,
+            "children": [],
+        }
+        items_by_path[path] = item
+
+        if depth == root.depth + 1:
+            tree.append(item)
+        elif parent := items_by_path.get(path[: -WagtailPage.steplen]):
+            parent["children"].append(item)
+        # Otherwise the parent was filtered out, and so is this page.
+
+    return tree
+
+
+def MenusQuery():
+    class Mixin:
+        menu_tree = graphene.List(
+            graphene.NonNull(MenuItemObjectType),
+            description=_(
+                "The live descendants of a page as a nested tree, fetched in a single query."
+            ),
+            root_page=graphene.Argument(
+                graphene.ID,
+                description=_(
+                    "The page to build the tree from. Defaults to the root page of the "
+                    "requested site, or of the default site."
+                ),
+            ),
+            depth=graphene.Argument(
+                PositiveInt,
+                description=_("The number of levels to include."),
+                default_value=2,
+            ),
+            in_menu=graphene.Argument(
+                graphene.Boolean,
+                description=_(
+                    "Filter pages by Page.show_in_menus property. That is, the "
+                    "'show in menus' checkbox is checked in the page editor."
+                ),
+                default_value=True,
+            ),
+            in_site=graphene.Argument(
+                graphene.Boolean,
+                description=_("Build the tree for the current site."),
+                default_value=False,
+            ),
+            site=graphene.Argument(
+                graphene.String,
+                description=_("Build the tree for the given site."),
+            ),
+            required=True,
+        )
+
+        def resolve_menu_tree(self, info, **kwargs):
+            site = get_site_filter(info, **kwargs)
+            if site is None and (kwargs.get("site") or kwargs.get("in_site")):
+                return []
+
+            depth = kwargs.get("depth") or 1
+
+            if root_id := kwargs.get("root_page"):
+                try:
+                    root = WagtailPage.objects.only("path", "depth").get(pk=root_id)
+                except WagtailPage.DoesNotExist:
+                    return []
+            else:
+                root_site = (
+                    site or find_site_for_request(info.context) or get_default_site()
+                )
+                if root_site is None:
+                    return []
+                root = root_site.root_page
+
+            in_menu = kwargs.get("in_menu")
+            if not grapple_settings.MENU_TREE_CACHE:
+                return build_menu_tree(root, depth, info, in_menu=in_menu, site=site)
+
+            # Page URLs may be prefixed with the active language.
+            key = (root.pk, depth, in_menu, site.pk if site else None, get_language())
+            tree = menu_tree_cache.get(key)
+            if tree is None:
+                tree = build_menu_tree(root, depth, info, in_menu=in_menu, site=site)
+                menu_tree_cache.set(key, tree)
+            return tree
+
+    return Mixin
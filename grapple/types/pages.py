@@ -6,12 +6,18 @@ from django.utils.translation import gettext_lazy as _
 from graphene_django.types import DjangoObjectType
 from graphql import GraphQLError
 from wagtail.models import Page as WagtailPage
-from wagtail.models import Site
 
 from ..registry import registry
-from ..utils import resolve_queryset, resolve_site_by_hostname
+from ..settings import grapple_settings
+from ..utils import (
+    find_site_for_request,
+    get_page_by_url_path,
+    get_page_url_resolver,
+    resolve_queryset,
+    resolve_site_by_hostname,
+)
 from .interfaces import get_page_interface
-from .structures import QuerySetList
+from .structures import PositiveInt, QuerySetList
 
 
 class Page(DjangoObjectType):
@@ -109,22 +115,9 @@ def get_specific_page(
         elif slug:
             page = qs.get(slug=slug)
         elif url_path:
-            if not url_path.endswith("/"):
-                url_path += "/"
-
-            if site:
-                # Got a site, so make the url_path query as specific as possible
-                qs = qs.filter(
-                    url_path=f"{site.root_page.url_path}{url_path.lstrip('/')}"
-                )
-            else:
-                # if the url_path is not specific enough, or the same url_path exists under multiple
-                # site roots, only the first one will be returned.
-                # To-Do: make site a 1st class argument on the page query, rather than just `in_site`
-                qs = qs.filter(url_path__endswith=url_path)
-
-            if qs.exists():
-                page = qs.first()
+            page = get_page_by_url_path(
+                qs, url_path, site=site, scope=(content_type or "").lower()
+            )
 
     except WagtailPage.DoesNotExist:
         page = None
@@ -147,7 +140,116 @@ def get_site_filter(info, **kwargs):
             filter_name="site",
         )
     elif in_current_site:
-        return Site.find_for_request(info.context)
+        return find_site_for_request(info.context)
+
+
+def get_pages_queryset(resolved_site=None, **kwargs):
+    """
+    Return the live, public pages matching the filters shared by the root
+    ``pages`` and ``pageUrls`` fields. ``resolved_site`` is the result of ``get_site_filter``.
+
+    Returns ``None`` if a site filter was passed but no ``Site`` matched it.
+    """
+    qs = WagtailPage.objects.all()
+
+    try:
+        if kwargs.get("parent"):
+            qs = WagtailPage.objects.get(id=kwargs.get("parent")).get_children()
+        elif kwargs.get("ancestor"):
+            qs = WagtailPage.objects.get(id=kwargs.get("ancestor")).get_descendants()
+    except WagtailPage.DoesNotExist:
+        qs = WagtailPage.objects.none()
+
+    # no need to the root page
+    pages = qs.live().public().filter(depth__gt=1)
+
+    site_hostname = kwargs.get("site", None)
+    in_current_site = kwargs.get("in_site", False)
+
+    if resolved_site is not None:
+        pages = pages.in_site(resolved_site)
+    elif any([site_hostname is not None, in_current_site is True]):
+        return None
+
+    content_type = kwargs.get("content_type", None)
+    content_types = content_type.split(",") if content_type else None
+    if content_types:
+        filters = Q()
+        for content_type in content_types:
+            app_label, model = content_type.strip().lower().split(".")
+            filters |= Q(content_type__app_label=app_label, content_type__model=model)
+        pages = pages.filter(filters)
+
+    return pages
+
+
+class PageIndexEntry(graphene.ObjectType):
+    """
+    A lightweight summary of a live page, built without instantiating the page.
+    """
+
+    id = graphene.ID(required=True)
+    content_type = graphene.String(required=True)
+    url_path = graphene.String(required=True)
+    url = graphene.String()
+    last_published_at = graphene.DateTime()
+    locale = graphene.String()
+
+
+def get_page_index(info, resolved_site=None, after=None, limit=None, **kwargs):
+    """
+    Return ``PageIndexEntry`` values for live, public pages ordered by ID,
+    starting after the ``after`` ID (keyset pagination).
+    """
+    pages = get_pages_queryset(resolved_site, **kwargs)
+    if pages is None:
+        return []
+
+    if since := kwargs.get("since"):
+        pages = pages.filter(last_published_at__gte=since)
+    if after is not None:
+        pages = pages.filter(pk__gt=after)
+
+    max_size = grapple_settings.PAGE_INDEX_MAX_SIZE
+    limit = min(int(limit or max_size), max_size)
+    rows = list(
+        pages.order_by("pk").values_list(
+            "pk",
+            "content_type_id",
+            "url_path",
+            "last_published_at",
+            "locale__language_code",
+        )[:limit]
+    )
+
+    urls = get_page_url_resolver(info, resolved_site).get_urls(
+        (pk, content_type_id, url_path)
+        for pk, content_type_id, url_path, *_rest in rows
+    )
+
+    content_types = {}
+    entries = []
+    for (pk, content_type_id, url_path, last_published_at, locale), url in zip(
+        rows, urls
+    ):
+        if content_type_id not in content_types:
+            content_type = ContentType.objects.get_for_id(content_type_id)
+            model = content_type.model_class()
+            content_types[content_type_id] = (
+                f"{content_type.app_label}.{model.__name__ if model else content_type.model}"
+            )
+
+        entries.append(
+            {
+                "id": pk,
+                "content_type": content_types[content_type_id],
+                "url_path": url_path,
+                "url": url,
+                "last_published_at": last_published_at,
+                "locale": locale,
+            }
+        )
+    return entries
 
 
 def PagesQuery():
@@ -225,48 +327,133 @@ def PagesQuery():
             ),
         )
 
-        # Return all pages in site, ideally specific.
-        def resolve_pages(self, info, **kwargs):
-            qs = WagtailPage.objects.all()
-
-            try:
-                if kwargs.get("parent"):
-                    qs = WagtailPage.objects.get(id=kwargs.get("parent")).get_children()
-                elif kwargs.get("ancestor"):
-                    qs = WagtailPage.objects.get(
-                        id=kwargs.get("ancestor")
-                    ).get_descendants()
-            except WagtailPage.DoesNotExist:
-                qs = WagtailPage.objects.none()
+        page_urls = graphene.List(
+            graphene.NonNull(graphene.String),
+            description=_(
+                "The URLs of live pages, computed without loading the pages. Suited to sitemaps."
+            ),
+            content_type=graphene.Argument(
+                graphene.String,
+                description=_(
+                    "Filter by content type. Uses the `app.Model` notation. Accepts a comma separated list of content types."
+                ),
+            ),
+            in_site=graphene.Argument(
+                graphene.Boolean,
+                description=_(
+                    "Filter to pages in the current site only. URLs are relative to the current site."
+                ),
+                default_value=False,
+            ),
+            site=graphene.Argument(
+                graphene.String,
+                description=_(
+                    "Filter to pages in the give site. URLs are relative to the given site."
+                ),
+            ),
+            ancestor=graphene.Argument(
+                graphene.ID,
+                description=_(
+                    "Filter to pages that are descendants of the given page."
+                ),
+            ),
+            parent=graphene.Argument(
+                graphene.ID,
+                description=_("Filter to pages that are children of the given page."),
+            ),
+            full_url=graphene.Argument(
+                graphene.Boolean,
+                description=_("Always return absolute URLs."),
+                default_value=False,
+            ),
+            in_menu=graphene.Argument(
+                graphene.Boolean,
+                description=_(
+                    "Filter pages by Page.show_in_menus property. That is, the "
+                    "'show in menus' checkbox is checked in the page editor."
+                ),
+            ),
+            limit=graphene.Argument(
+                PositiveInt, description=_("Limit a number of resulting objects.")
+            ),
+            offset=graphene.Argument(
+                PositiveInt,
+                description=_(
+                    "Number of records skipped from the beginning of the "
+                    "results set."
+                ),
+            ),
+            order=graphene.Argument(
+                graphene.String, description=_("Use the Django queryset order format.")
+            ),
+            required=True,
+        )
 
-            # no need to the root page
-            pages = qs.live().public().filter(depth__gt=1).specific()
+        page_index = graphene.List(
+            graphene.NonNull(PageIndexEntry),
+            description=_(
+                "A lightweight index of live pages, ordered by ID. "
+                "Use the last returned ID as `after` to fetch the next batch."
+            ),
+            content_type=graphene.Argument(
+                graphene.String,
+                description=_(
+                    "Filter by content type. Uses the `app.Model` notation. Accepts a comma separated list of content types."
+                ),
+            ),
+            in_site=graphene.Argument(
+                graphene.Boolean,
+                description=_("Filter to pages in the current site only."),
+                default_value=False,
+            ),
+            site=graphene.Argument(
+                graphene.String,
+                description=_("Filter to pages in the give site."),
+            ),
+            since=graphene.Argument(
+                graphene.DateTime,
+                description=_("Filter to pages last published at or after this time."),
+            ),
+            after=graphene.Argument(
+                graphene.ID,
+                description=_("Only return pages with an ID greater than this one."),
+            ),
+            limit=graphene.Argument(
+                PositiveInt,
+                description=_(
+                    "Limit a number of resulting entries. Defaults to, and is capped by, "
+                    "the `PAGE_INDEX_MAX_SIZE` setting."
+                ),
+            ),
+            required=True,
+        )
 
-            site = get_site_filter(info, **kwargs)
-            site_hostname = kwargs.get("site", None)
-            in_current_site = kwargs.get("in_site", False)
-
-            if site is not None:
-                pages = pages.in_site(site)
-            elif site is None and any(
-                [site_hostname is not None, in_current_site is True]
-            ):
+        # Return all pages in site, ideally specific.
+        def resolve_pages(self, info, **kwargs):
+            pages = get_pages_queryset(get_site_filter(info, **kwargs), **kwargs)
+            if pages is None:
                 # If we could not resolve a Site but _were_ passed a filter, we
                 # should not return any results.
                 return WagtailPage.objects.none()
 
-            content_type = kwargs.pop("content_type", None)
-            content_types = content_type.split(",") if content_type else None
-            if content_types:
-                filters = Q()
-                for content_type in content_types:
-                    app_label, model = content_type.strip().lower().split(".")
-                    filters |= Q(
-                        content_type__app_label=app_label, content_type__model=model
-                    )
-                pages = pages.filter(filters)
-
-            return resolve_queryset(pages, info, **kwargs)
+            kwargs.pop("content_type", None)
+            return resolve_queryset(pages.specific(), info, **kwargs)
+
+        def resolve_page_urls(self, info, **kwargs):
+            site = get_site_filter(info, **kwargs)
+            pages = get_pages_queryset(site, **kwargs)
+            if pages is None:
+                return []
+
+            full_url = kwargs.pop("full_url", False)
+            rows = resolve_queryset(
+                pages.values_list("pk", "content_type_id", "url_path"), info, **kwargs
+            )
+            urls = get_page_url_resolver(info, site).get_urls(rows, full_url=full_url)
+            return [url for url in urls if url is not None]
+
+        def resolve_page_index(self, info, **kwargs):
+            return get_page_index(info, get_site_filter(info, **kwargs), **kwargs)
 
         # Return a specific page, identified by ID or Slug.
         def resolve_page(self, info, **kwargs):
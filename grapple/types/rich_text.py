@@ -1,9 +1,413 @@
-from typing import Union
+import hashlib
+import json
 
+from html.parser import HTMLParser
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import CharField, QuerySet
+from django.db.models.functions import Cast
+from django.template.loader import render_to_string
 from graphene.types import String
+from wagtail import blocks
+from wagtail.fields import RichTextField, StreamField
+from wagtail.models import Page, ReferenceIndex
 from wagtail.rich_text import RichText as WagtailRichText
+from wagtail.rich_text import expand_db_html
 
+from ..cache import SharedLRUCache, bump_cache_version, get_cache_version
+from ..rich_text_ast import RichTextAST
 from ..settings import grapple_settings
+from ..utils import block_contains, get_request_cache, iter_raw_block_values
+
+
+# Rendered rich text keyed by output format and source hash, invalidated whenever
+# linked pages, images or documents change, or sites change.
+rendered_rich_text_cache = SharedLRUCache(
+    "rich-text", max_size_setting="RICHTEXT_CACHE_SIZE"
+)
+
+
+# Version token bumped when stored trees are invalidated.
+RICHTEXT_AST_CACHE = "rich-text-ast"
+
+
+# Joins rich text values expanded together. It cannot occur in stored HTML.
+SEPARATOR = "\x00"
+
+
+class RenderedRichText(str):
+    """
+    HTML already rendered from rich text, returned as is by the ``RichText`` scalar.
+    """
+
+
+def _source_hash(source: str) -> str:
+    return hashlib.sha256(source.encode()).hexdigest()
+
+
+def _rich_text_cache_key(source: str) -> str:
+    return f"html:{_source_hash(source)}"
+
+
+def expand_rich_text_many(sources: List[str]) -> List[str]:
+    """
+    Render rich text values to HTML with a single pass of Wagtail's rewriters, so
+    the pages, documents and images they reference are loaded with one query per
+    model, rather than one set of queries per value.
+    """
+    if len(sources) < 2 or any(SEPARATOR in source for source in sources):
+        return [str(WagtailRichText(source).__html__()) for source in sources]
+
+    parts = expand_db_html(SEPARATOR.join(sources)).split(SEPARATOR)
+    if len(parts) != len(sources):
+        # A malformed value swallowed a separator, render them one by one.
+        return [str(WagtailRichText(source).__html__()) for source in sources]
+
+    # Same output as RichText.__html__, for already expanded HTML.
+    return [
+        render_to_string("wagtailcore/shared/richtext.html", {"html": part})
+        for part in parts
+    ]
+
+
+def render_rich_text_many(sources: Iterable[str]) -> List[str]:
+    """
+    Render rich text values from their database representation to HTML, through
+    the rendered rich text cache when ``RICHTEXT_CACHE`` is enabled.
+
+    The output does not depend on the request, as links are expanded with
+    ``Page.url``, so the site is not part of the cache key.
+    """
+    sources = list(sources)
+    if not grapple_settings.RICHTEXT_CACHE:
+        return expand_rich_text_many(sources)
+
+    rendered = {}
+    for source in sources:
+        if source not in rendered:
+            key = _rich_text_cache_key(source)
+            rendered[source] = rendered_rich_text_cache.get(key)
+
+    misses = [source for source, html in rendered.items() if html is None]
+    for source, html in zip(misses, expand_rich_text_many(misses)):
+        rendered_rich_text_cache.set(_rich_text_cache_key(source), html)
+        rendered[source] = html
+
+    return [rendered[source] for source in sources]
+
+
+def render_rich_text(source: str) -> str:
+    if not source:
+        return WagtailRichText(source).__html__()
+    return render_rich_text_many([source])[0]
+
+
+# Elements without content or closing tag, which get no "children".
+VOID_ELEMENTS = frozenset(
+    {"area", "br", "col", "embed", "hr", "img", "input", "source", "track", "wbr"}
+)
+
+
+class RichTextTreeBuilder(HTMLParser):
+    """
+    Parse rendered rich text into a compact node tree.
+
+    Text is kept as strings, and elements become ``{"type": tag}`` objects, with
+    ``attrs`` and ``children`` only when they have some.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.tree = []
+        self._open = [("", self.tree)]
+
+    def handle_starttag(self, tag, attrs):
+        node = {"type": tag}
+        if attrs:
+            # Boolean attributes have no value.
+            node["attrs"] = {name: value or "" for name, value in attrs}
+        self._open[-1][1].append(node)
+
+        if tag not in VOID_ELEMENTS:
+            node["children"] = []
+            self._open.append((tag, node["children"]))
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_ELEMENTS:
+            self._open.pop()
+
+    def handle_endtag(self, tag):
+        # Close unclosed descendants along with the element, ignore stray end tags.
+        if any(open_tag == tag for open_tag, _children in self._open[1:]):
+            while self._open.pop()[0] != tag:
+                pass
+
+    def handle_data(self, data):
+        children = self._open[-1][1]
+        if children and isinstance(children[-1], str):
+            children[-1] += data
+        else:
+            children.append(data)
+
+
+def _prune_tree(nodes: list, *, root: bool = False) -> list:
+    pruned = []
+    for node in nodes:
+        if isinstance(node, str):
+            # Whitespace between top level blocks is not content.
+            if not root or node.strip():
+                pruned.append(node)
+            continue
+        if "children" in node:
+            node["children"] = _prune_tree(node["children"])
+            if not node["children"]:
+                del node["children"]
+        pruned.append(node)
+    return pruned
+
+
+def build_rich_text_tree(html: str) -> list:
+    builder = RichTextTreeBuilder()
+    builder.feed(html)
+    builder.close()
+    return _prune_tree(builder.tree, root=True)
+
+
+def load_rich_text_trees(
+    sources: Iterable[str], *, store: Optional[bool] = None
+) -> Dict[str, list]:
+    """
+    Return the node trees of rich text values, keyed by source.
+
+    Stored trees are fetched in one query. The others are built from the values
+    rendered in one batch. They are stored for the next requests when ``store``
+    is set, which defaults to ``RICHTEXT_AST_STORE_ON_REQUEST``, unless trees were
+    invalidated meanwhile, as they may contain the URLs from before the change.
+    """
+    if store is None:
+        store = grapple_settings.RICHTEXT_AST_STORE_ON_REQUEST
+    hashes = {_source_hash(source): source for source in sources if source}
+    trees = dict(
+        RichTextAST.objects.filter(source_hash__in=hashes).values_list(
+            "source_hash", "tree"
+        )
+    )
+
+    misses = [
+        source for source_hash, source in hashes.items() if source_hash not in trees
+    ]
+    if misses:
+        if store:
+            version = get_cache_version(RICHTEXT_AST_CACHE)
+        built = [
+            RichTextAST(
+                source_hash=_source_hash(source), tree=build_rich_text_tree(html)
+            )
+            for source, html in zip(misses, expand_rich_text_many(misses))
+        ]
+        if store:
+            # Another process may have stored the same trees meanwhile.
+            RichTextAST.objects.bulk_create(built, ignore_conflicts=True)
+            if get_cache_version(RICHTEXT_AST_CACHE) != version:
+                # An invalidation ran while rendering, and may have missed these rows.
+                RichTextAST.objects.filter(
+                    source_hash__in=[ast.source_hash for ast in built]
+                ).delete()
+        trees.update((ast.source_hash, ast.tree) for ast in built)
+
+    return {source: trees[source_hash] for source_hash, source in hashes.items()}
+
+
+def render_rich_text_ast_many(sources: Iterable[str]) -> List[str]:
+    """
+    Return the node trees of rich text values, serialized to JSON.
+    """
+    sources = list(sources)
+    trees = load_rich_text_trees(sources)
+    return [
+        json.dumps(trees.get(source, []), ensure_ascii=False, separators=(",", ":"))
+        for source in sources
+    ]
+
+
+def collect_rich_text(instance) -> Iterator[str]:
+    """
+    Yield the rich text values of a model instance, from its rich text fields and
+    the rich text blocks of its StreamFields.
+    """
+    for field in instance._meta.concrete_fields:
+        if isinstance(field, RichTextField):
+            yield field.value_from_object(instance)
+        elif isinstance(field, StreamField):
+            stream_value = field.value_from_object(instance)
+            if stream_value is None:
+                continue
+            yield from iter_raw_block_values(
+                field.stream_block, list(stream_value.raw_data), blocks.RichTextBlock
+            )
+
+
+def store_rich_text_trees(instance) -> None:
+    """
+    Build and store the node trees of the rich text of an instance, so they are
+    served without parsing.
+    """
+    load_rich_text_trees(
+        (source for source in collect_rich_text(instance) if isinstance(source, str)),
+        store=True,
+    )
+
+
+def get_references_to(instance) -> QuerySet:
+    """
+    Return the reference index entries of the content linking to an instance. The
+    URLs of the descendants of a page derive from its own, so links to them are
+    included.
+    """
+    references = ReferenceIndex.get_references_to(instance)
+    if isinstance(instance, Page):
+        descendant_ids = (
+            Page.objects.descendant_of(instance)
+            .annotate(object_id=Cast("pk", output_field=CharField()))
+            .values("object_id")
+        )
+        references |= ReferenceIndex.objects.filter(
+            to_content_type=ContentType.objects.get_for_model(Page),
+            to_object_id__in=descendant_ids,
+        )
+    return references
+
+
+def get_referencing_objects(references: QuerySet) -> Iterator:
+    """
+    Yield the objects recorded as the source of reference index entries.
+    """
+    object_ids = {}
+    for content_type_id, object_id in references.values_list(
+        "content_type_id", "object_id"
+    ).distinct():
+        object_ids.setdefault(content_type_id, []).append(object_id)
+
+    for content_type_id, ids in object_ids.items():
+        model = ContentType.objects.get_for_id(content_type_id).model_class()
+        if model is not None:
+            yield from model._default_manager.filter(pk__in=ids)
+
+
+def invalidate_rich_text_trees(references: Optional[QuerySet] = None) -> None:
+    """
+    Remove the stored trees of the rich text of the objects with the given
+    reference index entries, or every stored tree. Trees contain resolved page,
+    document and image URLs.
+    """
+    # Before removing rows, so trees being built meanwhile are not kept.
+    bump_cache_version(RICHTEXT_AST_CACHE)
+    if references is None:
+        RichTextAST.objects.all().delete()
+        return
+
+    RichTextAST.objects.filter(
+        source_hash__in={
+            _source_hash(source)
+            for instance in get_referencing_objects(references)
+            for source in collect_rich_text(instance)
+            if source and isinstance(source, str)
+        }
+    ).delete()
+
+
+RICHTEXT_RENDERERS = {
+    "html": render_rich_text_many,
+    "ast": render_rich_text_ast_many,
+}
+
+
+class RichTextRenderer:
+    """
+    Render the rich text used in a GraphQL request in batches.
+
+    Values found while resolving a page or a StreamField are queued with ``prime()``.
+    The first ``render()`` renders every queued value at once, and the results are
+    memoized for the rest of the request.
+    """
+
+    def __init__(self):
+        self._rendered: Dict[str, str] = {}
+        self._pending = set()
+
+    def prime(self, sources: Iterable[str]) -> None:
+        self._pending.update(
+            source
+            for source in sources
+            if source and isinstance(source, str) and source not in self._rendered
+        )
+
+    def render(self, source: Optional[str]) -> Optional[str]:
+        if source is None:
+            return source
+
+        if source not in self._rendered:
+            self._pending.add(source)
+            pending, self._pending = list(self._pending), set()
+            render_many = RICHTEXT_RENDERERS[grapple_settings.RICHTEXT_FORMAT]
+            self._rendered.update(zip(pending, render_many(pending)))
+        return RenderedRichText(self._rendered[source])
+
+
+def get_rich_text_renderer(info) -> RichTextRenderer:
+    cache = get_request_cache(info, "rich-text")
+    try:
+        return cache["renderer"]
+    except KeyError:
+        cache["renderer"] = RichTextRenderer()
+        return cache["renderer"]
+
+
+def render_request_rich_text(info, source: Optional[str]):
+    """
+    Return the value to serialize for a rich text source: rendered HTML or node
+    tree, batched with the other rich text in the request, or the source for the
+    ``raw`` format.
+    """
+    if grapple_settings.RICHTEXT_FORMAT not in RICHTEXT_RENDERERS:
+        return source
+    return get_rich_text_renderer(info).render(source)
+
+
+def prime_rich_text(info, sources: Iterable[str]) -> None:
+    if grapple_settings.RICHTEXT_FORMAT in RICHTEXT_RENDERERS:
+        get_rich_text_renderer(info).prime(sources)
+
+
+def prime_instance_rich_text(info, instance) -> None:
+    """
+    Queue the values of every rich text field of a model instance.
+    """
+    prime_rich_text(
+        info,
+        (
+            field.value_from_object(instance)
+            for field in instance._meta.concrete_fields
+            if isinstance(field, RichTextField)
+        ),
+    )
+
+
+def prime_stream_rich_text(info, stream_value) -> None:
+    """
+    Queue the rich text blocks of a StreamValue, read from its raw data.
+    """
+    if block_contains(stream_value.stream_block, blocks.RichTextBlock):
+        prime_rich_text(
+            info,
+            iter_raw_block_values(
+                stream_value.stream_block,
+                list(stream_value.raw_data),
+                blocks.RichTextBlock,
+            ),
+        )
 
 
 class RichText(String):
@@ -11,10 +415,16 @@ class RichText(String):
     def coerce_rich_text(rich_text: Union[str, WagtailRichText]):
         # When serializing a model instance, we get a str. When serializing a
         # RichTextBlock instance, its an instance of wagtail.rich_text.RichText already.
+        if isinstance(rich_text, RenderedRichText):
+            return rich_text
         if grapple_settings.RICHTEXT_FORMAT == "html":
             if isinstance(rich_text, str):
-                return WagtailRichText(rich_text).__html__()
-            return rich_text.__html__()
+                return render_rich_text(rich_text)
+            return render_rich_text(rich_text.source)
+        elif grapple_settings.RICHTEXT_FORMAT == "ast":
+            if isinstance(rich_text, str):
+                return render_rich_text_ast_many([rich_text])[0]
+            return render_rich_text_ast_many([rich_text.source])[0]
         elif isinstance(rich_text, str):
             return rich_text
         else:
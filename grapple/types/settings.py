@@ -2,10 +2,9 @@ import graphene
 
 from graphql import GraphQLError
 from wagtail.contrib.settings.models import BaseGenericSetting, BaseSiteSetting
-from wagtail.models import Site
 
 from ..registry import registry
-from ..utils import resolve_site_by_hostname
+from ..utils import get_site_count, resolve_site_by_hostname
 
 
 def SettingsQuery():
@@ -52,7 +51,7 @@ def SettingsQuery():
                     if issubclass(setting._meta.model, BaseSiteSetting):
                         if site:
                             return setting._meta.model.objects.filter(site=site).first()
-                        elif Site.objects.all().count() == 1:
+                        elif get_site_count() == 1:
                             # If there's only one Site, we can reliably return
                             # the correct (i.e. only) SiteSetting.
                             return setting._meta.model.objects.first()
@@ -9,24 +9,37 @@ import wagtail.embeds.blocks
 import wagtail.images.blocks
 import wagtail.snippets.blocks
 
+from django.apps import apps
+from django.utils.translation import gettext_lazy as _
 from graphene.types import Scalar
 from graphene_django.converter import convert_django_field
 from wagtail import blocks
+from wagtail.blocks.list_block import ListValue
 from wagtail.embeds.blocks import EmbedValue
 from wagtail.embeds.embeds import get_embed
 from wagtail.embeds.exceptions import EmbedException
 from wagtail.fields import StreamField
 
+from ..embeds import get_embed_loader
 from ..registry import registry
-from .interfaces import StreamFieldInterface
+from ..utils import block_contains
+from .interfaces import (
+    StreamFieldInterface,
+    get_streamfield_block_type,
+    streamfield_block_types,
+)
 from .rich_text import RichText as RichTextType
+from .rich_text import render_request_rich_text
+from .structures import PositiveInt
 
 
 class GenericStreamFieldInterface(Scalar):
     @staticmethod
     def serialize(stream_value):
+        # Lazy StreamValues, as loaded from the database, hand back their stored
+        # JSON data here without any block being converted to its Python value.
         try:
-            return stream_value.raw_data
+            return list(stream_value.raw_data)
         except AttributeError:
             return stream_value.stream_data
 
@@ -38,6 +51,184 @@ def convert_stream_field(field, registry=None):
     )
 
 
+def get_slice_args() -> dict:
+    """
+    Arguments accepted by block lists to return a slice of their blocks.
+    """
+    return {
+        "limit": graphene.Argument(
+            PositiveInt, description=_("The maximum number of blocks to return.")
+        ),
+        "offset": graphene.Argument(
+            PositiveInt, description=_("The number of blocks to skip.")
+        ),
+    }
+
+
+def get_stream_value_args() -> dict:
+    """
+    Arguments accepted by StreamField list fields to select blocks before they are decoded.
+    """
+    return {
+        "block_types": graphene.Argument(
+            graphene.List(graphene.NonNull(graphene.String)),
+            description=_("Only return blocks of these types."),
+        ),
+        **get_slice_args(),
+    }
+
+
+def filter_stream_value(value, *, block_types=None, limit=None, offset=None, **kwargs):
+    """
+    Select blocks from a StreamField value by type and position.
+
+    StreamValues are filtered on their raw JSON data and a new lazy StreamValue is
+    returned, so blocks that are skipped are never converted to Python values
+    (and their chooser blocks never queried). Other lists are sliced as they are.
+    """
+    if value is None:
+        return None
+
+    if isinstance(value, DeferredListValue):
+        return list(value.get_slice(offset or 0, limit))
+
+    if isinstance(value, blocks.StreamValue):
+        raw_data = list(value.raw_data)
+        if block_types is not None:
+            raw_data = [block for block in raw_data if block["type"] in block_types]
+    else:
+        raw_data = list(value)
+
+    offset = offset or 0
+    raw_data = raw_data[offset : offset + limit if limit is not None else None]
+
+    if isinstance(value, blocks.StreamValue):
+        return blocks.StreamValue(value.stream_block, raw_data, is_lazy=True)
+    return raw_data
+
+
+class DeferredListValue(ListValue):
+    """
+    A ListBlock value whose items are converted to Python values when they are used.
+
+    ``get_slice()`` only converts the selected items, so the chooser blocks of the
+    other items are never queried. Any other use converts the whole list, as
+    ``ListBlock.to_python()`` would have.
+    """
+
+    def __init__(self, list_block, raw_items):
+        self.list_block = list_block
+        self.raw_items = list(raw_items or [])
+        self._bound_blocks = None
+
+    @property
+    def bound_blocks(self):
+        if self._bound_blocks is None:
+            self._bound_blocks = self.list_block.to_python(self.raw_items).bound_blocks
+        return self._bound_blocks
+
+    @bound_blocks.setter
+    def bound_blocks(self, bound_blocks):
+        self._bound_blocks = bound_blocks
+
+    def __len__(self):
+        if self._bound_blocks is None:
+            return len(self.raw_items)
+        return len(self._bound_blocks)
+
+    def get_slice(self, offset: int = 0, limit: Optional[int] = None) -> ListValue:
+        stop = offset + limit if limit is not None else None
+        if self._bound_blocks is None:
+            return self.list_block.to_python(self.raw_items[offset:stop])
+        return ListValue(self.list_block, bound_blocks=self._bound_blocks[offset:stop])
+
+    def get_prep_value(self):
+        if self._bound_blocks is None:
+            return self.raw_items
+        return super().get_prep_value()
+
+
+def _uses_default_conversion(block, base_class) -> bool:
+    return (
+        type(block).to_python is base_class.to_python
+        and type(block).bulk_to_python is base_class.bulk_to_python
+    )
+
+
+def bulk_to_python_deferred(block, raw_values: list) -> list:
+    """
+    Convert raw block values like ``block.bulk_to_python()``, except that the items
+    of ListBlocks, on their own or within StructBlocks, are left to be converted
+    when used. Blocks overriding their conversion are converted as usual.
+    """
+    if isinstance(block, blocks.ListBlock) and _uses_default_conversion(
+        block, blocks.ListBlock
+    ):
+        return [DeferredListValue(block, raw_items) for raw_items in raw_values]
+
+    if (
+        isinstance(block, blocks.BaseStructBlock)
+        and block_contains(block, blocks.ListBlock)
+        and _uses_default_conversion(block, blocks.BaseStructBlock)
+    ):
+        struct_items = [[] for _raw_value in raw_values]
+        for name, child_block in block.child_blocks.items():
+            indexes = [i for i, raw in enumerate(raw_values) if name in raw]
+            converted = dict(
+                zip(
+                    indexes,
+                    bulk_to_python_deferred(
+                        child_block, [raw_values[i][name] for i in indexes]
+                    ),
+                )
+            )
+            for i, items in enumerate(struct_items):
+                if i in converted:
+                    items.append((name, converted[i]))
+                else:
+                    items.append((name, child_block.get_default()))
+        return [block._to_struct_value(items) for items in struct_items]
+
+    return block.bulk_to_python(raw_values)
+
+
+def defer_list_blocks(stream_value):
+    """
+    Convert the children of a StreamValue that contain ListBlocks, leaving their
+    ListBlock items to be converted when they are used, so that a slice of the
+    items can be converted on its own.
+
+    The StreamValue is updated in place: its other children are still converted
+    when first read, and its raw data is kept as loaded.
+    """
+    if not isinstance(stream_value, blocks.StreamValue) or not block_contains(
+        stream_value.stream_block, blocks.ListBlock
+    ):
+        return stream_value
+
+    # Children not converted yet, as StreamValue._prefetch_blocks finds them.
+    indexes_by_type = {}
+    for index, (raw_child, bound_child) in enumerate(
+        zip(stream_value._raw_data, stream_value._bound_blocks)
+    ):
+        if bound_child is None:
+            indexes_by_type.setdefault(raw_child["type"], []).append(index)
+
+    for type_name, indexes in indexes_by_type.items():
+        child_block = stream_value.stream_block.child_blocks.get(type_name)
+        if child_block is None or not block_contains(child_block, blocks.ListBlock):
+            continue
+        values = bulk_to_python_deferred(
+            child_block, [stream_value._raw_data[i]["value"] for i in indexes]
+        )
+        for index, value in zip(indexes, values):
+            stream_value._bound_blocks[index] = blocks.StreamValue.StreamChild(
+                child_block, value, id=stream_value._raw_data[index].get("id")
+            )
+
+    return stream_value
+
+
 def generate_streamfield_union(graphql_types):
     class StreamfieldUnion(graphene.Union):
         class Meta:
@@ -58,6 +249,28 @@ def generate_streamfield_union(graphql_types):
     return StreamfieldUnion
 
 
+def get_child_block_map(block) -> dict:
+    """
+    Return the child blocks of a StructBlock or StreamBlock keyed by name, along with
+    whether integer values of each child are IDs to pass through ``to_python()``.
+    The map is computed once per block definition and kept on the block.
+    """
+    try:
+        return block._grapple_child_block_map
+    except AttributeError:
+        pass
+
+    block._grapple_child_block_map = {
+        name: (
+            child_block,
+            isinstance(child_block, blocks.ChooserBlock)
+            or not isinstance(child_block, blocks.StructBlock),
+        )
+        for name, child_block in block.child_blocks.items()
+    }
+    return block._grapple_child_block_map
+
+
 class StructBlockItem:
     id = None
     block = None
@@ -73,48 +286,73 @@ class StructBlock(graphene.ObjectType):
     class Meta:
         interfaces = (StreamFieldInterface,)
 
-    blocks = graphene.List(graphene.NonNull(StreamFieldInterface), required=True)
-
-    def resolve_blocks(self, info, **kwargs):
-        stream_blocks = []
+    blocks = graphene.List(
+        graphene.NonNull(StreamFieldInterface), required=True, **get_slice_args()
+    )
+    total_count = graphene.Int(
+        required=True, description=_("The number of blocks, before any slicing.")
+    )
 
+    def _get_stream_data(self):
         if issubclass(type(self.value), blocks.stream_block.StreamValue):
             # self: StreamChild, block: StreamBlock, value: StreamValue
-            stream_data = self.value[0]
-            child_blocks = self.value.stream_block.child_blocks
-        else:
-            # This occurs when StreamBlock is child of StructBlock
-            # self: StructBlockItem, block: StreamBlock, value: list
-            stream_data = self.value
-            child_blocks = self.block.child_blocks
-
-        for field, value in stream_data.items():
-            block = dict(child_blocks)[field]
-            if isinstance(value, int) and (
-                issubclass(type(block), blocks.ChooserBlock)
-                or not issubclass(type(block), blocks.StructBlock)
-            ):
+            return self.value[0], self.value.stream_block
+        # This occurs when StreamBlock is child of StructBlock
+        # self: StructBlockItem, block: StreamBlock, value: list
+        return self.value, self.block
+
+    def resolve_blocks(self, info, limit=None, offset=None, **kwargs):
+        stream_blocks = []
+        stream_data, parent_block = StructBlock._get_stream_data(self)
+
+        items = list(stream_data.items())
+        if limit is not None or offset:
+            offset = offset or 0
+            items = items[offset : offset + limit if limit is not None else None]
+
+        child_block_map = get_child_block_map(parent_block)
+        for field, value in items:
+            block, converts_ids = child_block_map[field]
+            if converts_ids and isinstance(value, int):
                 value = block.to_python(value)
 
             stream_blocks.append(StructBlockItem(field, block, value))
 
         return stream_blocks
 
+    def resolve_total_count(self, info, **kwargs):
+        return len(StructBlock._get_stream_data(self)[0])
+
 
 class StreamBlock(StructBlock):
     class Meta:
         interfaces = (StreamFieldInterface,)
 
+    blocks = graphene.List(
+        graphene.NonNull(StreamFieldInterface),
+        required=True,
+        **get_stream_value_args(),
+    )
+
     def resolve_blocks(self, info, **kwargs):
-        child_blocks = self.value.stream_block.child_blocks
+        stream_value = self.value
+        if kwargs:
+            # Skipped blocks are never converted.
+            stream_value = filter_stream_value(stream_value, **kwargs)
+        stream_value = defer_list_blocks(stream_value)
+        child_blocks = stream_value.stream_block.child_blocks
 
         return [
             StructBlockItem(
                 id=stream.id, block=child_blocks[stream.block_type], value=stream.value
             )
-            for stream in self.value
+            for stream in stream_value
         ]
 
+    def resolve_total_count(self, info, **kwargs):
+        # Counted on the raw data, without converting the blocks.
+        return len(self.value)
+
 
 class StreamFieldBlock(graphene.ObjectType):
     value = graphene.String(required=True)
@@ -216,7 +454,7 @@ class RichTextBlock(graphene.ObjectType):
         interfaces = (StreamFieldInterface,)
 
     def resolve_value(self, info, **kwargs):
-        return RichTextType.serialize(self.value.source)
+        return RichTextType.serialize(render_request_rich_text(info, self.value.source))
 
 
 class RawHTMLBlock(graphene.ObjectType):
@@ -257,7 +495,11 @@ def get_embed_url(instance):
     return instance.value.url if hasattr(instance, "value") else instance.url
 
 
-def get_embed_object(instance):
+def get_embed_object(instance, info=None):
+    if info is not None:
+        # Memoized for the request, and loaded in batches
+        return get_embed_loader(info).get(get_embed_url(instance))
+
     try:
         return get_embed(get_embed_url(instance))
     except EmbedException:
@@ -285,12 +527,12 @@ class EmbedBlock(graphene.ObjectType):
         return EmbedBlock.resolve_raw_value(self, info, **kwargs)
 
     def resolve_embed(self: EmbedValue, info, **kwargs) -> Optional[str]:
-        embed = get_embed_object(self)
+        embed = get_embed_object(self, info)
         if embed:
             return embed.html
 
     def resolve_raw_embed(self: EmbedValue, info, **kwargs) -> Optional[str]:
-        embed = get_embed_object(self)
+        embed = get_embed_object(self, info)
         if embed:
             return {
                 "title": embed.title,
@@ -310,16 +552,33 @@ class StaticBlock(graphene.ObjectType):
 
 
 class ListBlock(graphene.ObjectType):
-    items = graphene.List(graphene.NonNull(StreamFieldInterface), required=True)
+    items = graphene.List(
+        graphene.NonNull(StreamFieldInterface), required=True, **get_slice_args()
+    )
+    total_count = graphene.Int(
+        required=True, description=_("The number of items, before any slicing.")
+    )
 
     class Meta:
         interfaces = (StreamFieldInterface,)
 
-    def resolve_items(self, info, **kwargs):
+    def resolve_items(self, info, limit=None, offset=None, **kwargs):
         # Get the nested StreamBlock type
         block_type = self.block.child_block
+        items = self.value
+        if limit is not None or offset:
+            offset = offset or 0
+            if isinstance(items, DeferredListValue):
+                # Only the returned items are converted.
+                items = items.get_slice(offset, limit)
+            else:
+                stop = offset + limit if limit is not None else None
+                items = list(items)[offset:stop]
         # Return a list of GraphQL types from the list of values
-        return [StructBlockItem(self.id, block_type, item) for item in self.value]
+        return [StructBlockItem(self.id, block_type, item) for item in items]
+
+    def resolve_total_count(self, info, **kwargs):
+        return len(self.value)
 
 
 registry.streamfield_blocks.update(
@@ -404,3 +663,35 @@ def register_streamfield_blocks():
             wagtail.snippets.blocks.SnippetChooserBlock: SnippetChooserBlock,
         }
     )
+
+    build_streamfield_block_types()
+
+
+def _iter_child_blocks(block):
+    if isinstance(block, blocks.ListBlock):
+        yield block.child_block
+    elif isinstance(block, (blocks.StreamBlock, blocks.StructBlock)):
+        yield from block.child_blocks.values()
+
+
+def build_streamfield_block_types():
+    """
+    Precompute the GraphQL type of every block class used in a model StreamField,
+    so that resolving the type of a block instance is a single dictionary lookup.
+    """
+    streamfield_block_types.clear()
+
+    seen = set()
+    for model in apps.get_models():
+        for field in model._meta.get_fields():
+            if not isinstance(field, StreamField):
+                continue
+
+            pending = [field.stream_block]
+            while pending:
+                block = pending.pop()
+                if not isinstance(block, blocks.Block) or id(block) in seen:
+                    continue
+                seen.add(id(block))
+                get_streamfield_block_type(type(block))
+                pending.extend(_iter_child_blocks(block))
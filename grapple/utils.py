@@ -1,15 +1,29 @@
-from typing import Literal, Optional
+from typing import Iterable, Iterator, List, Literal, Optional
+from urllib.parse import quote
 
 from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import ImproperlyConfigured
 from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
 from django.db import connection
-from graphql import GraphQLError
+from django.http.request import split_domain_port
+from django.urls import NoReverseMatch, reverse
+from django.utils import translation
+from django.utils.http import RFC3986_SUBDELIMS
+from graphql import FieldNode, FragmentSpreadNode, GraphQLError, InlineFragmentNode
 from wagtail import VERSION as WAGTAIL_VERSION
-from wagtail.models import Site
+from wagtail import blocks
+from wagtail.coreutils import get_supported_content_language_variant
+from wagtail.models import Page, Site
 from wagtail.search.index import class_is_indexed
 from wagtail.search.utils import parse_query_string
 
+from .cache import (
+    VersionedCache,
+    get_cached_media_urls,
+    get_cached_route,
+    set_cached_route,
+)
 from .settings import grapple_settings
 from .types.structures import BasePaginatedType, PaginationType
 
@@ -26,6 +40,130 @@ if grapple_settings.ADD_SEARCH_HIT:
         from wagtail.search.models import Query
 
 
+# Site.find_for_request match priorities, as in wagtail.models.sites.get_site_for_hostname
+MATCH_HOSTNAME_PORT = 0
+MATCH_HOSTNAME_DEFAULT = 1
+MATCH_DEFAULT = 2
+MATCH_HOSTNAME = 3
+
+
+class SiteTable:
+    """
+    An in-memory table of all `Site` objects, with their root pages, shared
+    between requests when the ``SITE_CACHE`` setting is enabled. It is rebuilt
+    in every process once a `Site` is saved or deleted, or a page is moved or
+    published, which may change a root page URL path.
+    """
+
+    def __init__(self):
+        self._cache = VersionedCache("sites")
+
+    def _get_table(self) -> dict:
+        table = self._cache.get("table")
+        if table is None:
+            sites = list(
+                Site.objects.select_related("root_page").order_by("hostname", "port")
+            )
+            by_hostname = {}
+            for site in sites:
+                by_hostname.setdefault(site.hostname, []).append(site)
+            table = {
+                "sites": sites,
+                "by_id": {str(site.pk): site for site in sites},
+                "by_hostname": by_hostname,
+                "default": next((site for site in sites if site.is_default_site), None),
+            }
+            self._cache.set("table", table)
+        return table
+
+    @property
+    def sites(self) -> List[Site]:
+        return self._get_table()["sites"]
+
+    @property
+    def default(self) -> Optional[Site]:
+        return self._get_table()["default"]
+
+    def get_by_id(self, id) -> Optional[Site]:
+        return self._get_table()["by_id"].get(str(id))
+
+    def filter_by_hostname(self, hostname: str, port=None) -> List[Site]:
+        sites = self._get_table()["by_hostname"].get(hostname, [])
+        if port is None:
+            return sites
+        return [site for site in sites if str(site.port) == str(port)]
+
+    def find_for_hostname(self, hostname: str, port) -> Optional[Site]:
+        """
+        Find the `Site` serving the given hostname and port, following the same
+        rules as ``Site.find_for_request``.
+        """
+        table = self._get_table()
+        matches = []
+        for site in table["by_hostname"].get(hostname, []):
+            if str(site.port) == str(port):
+                matches.append((MATCH_HOSTNAME_PORT, site))
+            elif site.is_default_site:
+                matches.append((MATCH_HOSTNAME_DEFAULT, site))
+            else:
+                matches.append((MATCH_HOSTNAME, site))
+        default = table["default"]
+        if default is not None and default.hostname != hostname:
+            matches.append((MATCH_DEFAULT, default))
+
+        if not matches:
+            return None
+
+        matches.sort(key=lambda match: match[0])
+        match, site = matches[0]
+        if len(matches) == 1 or match in (MATCH_HOSTNAME_PORT, MATCH_HOSTNAME_DEFAULT):
+            return site
+        if match == MATCH_DEFAULT:
+            # If a single other site has this hostname, prefer it over the default.
+            return matches[len(matches) == 2][1]
+        return None
+
+    def find_for_request(self, request) -> Optional[Site]:
+        hostname = split_domain_port(request.get_host())[0]
+        return self.find_for_hostname(hostname, request.get_port())
+
+    def invalidate(self) -> None:
+        self._cache.invalidate()
+
+
+site_table = SiteTable()
+
+
+def get_site_count() -> int:
+    if grapple_settings.SITE_CACHE:
+        return len(site_table.sites)
+    return Site.objects.count()
+
+
+def get_default_site() -> Optional[Site]:
+    """
+    Return the default `Site`, with its root page, using the site table if enabled.
+    """
+    if grapple_settings.SITE_CACHE:
+        return site_table.default
+    return Site.objects.select_related("root_page").filter(is_default_site=True).first()
+
+
+def find_site_for_request(request) -> Optional[Site]:
+    """
+    Return the `Site` serving the request, using the site table if enabled.
+    The result is stored where ``Site.find_for_request`` caches it, so Wagtail's
+    own lookups for the same request reuse it.
+    """
+    if (
+        request is not None
+        and grapple_settings.SITE_CACHE
+        and not hasattr(request, "_wagtail_site")
+    ):
+        request._wagtail_site = site_table.find_for_request(request)
+    return Site.find_for_request(request)
+
+
 def resolve_site_by_id(
     *,
     id: int,
@@ -34,6 +172,9 @@ def resolve_site_by_id(
     Find a `Site` object by ID
     """
 
+    if grapple_settings.SITE_CACHE:
+        return site_table.get_by_id(id)
+
     try:
         return Site.objects.get(id=id)
     except Site.DoesNotExist:
@@ -41,6 +182,14 @@ def resolve_site_by_id(
         return None
 
 
+def _multiple_sites_error(hostname: str, filter_name: str) -> GraphQLError:
+    return GraphQLError(
+        f"Your filter `{filter_name}={hostname}` returned "
+        "multiple sites. Try including a port number to disambiguate "
+        f"(e.g. `{filter_name}={hostname}:8000`)."
+    )
+
+
 def resolve_site_by_hostname(
     *,
     hostname: str,
@@ -59,30 +208,346 @@ def resolve_site_by_hostname(
     """
 
     # Optionally allow querying by port
+    port = None
     if ":" in hostname:
         (hostname, port) = hostname.split(":", 1)
-        query = {
-            "hostname": hostname,
-            "port": port,
-        }
-    else:
-        query = {
-            "hostname": hostname,
-        }
+
+    if grapple_settings.SITE_CACHE:
+        sites = site_table.filter_by_hostname(hostname, port)
+        if len(sites) > 1:
+            raise _multiple_sites_error(hostname, filter_name)
+        # No match is an expected error, so should not raise a GraphQLError.
+        return sites[0] if sites else None
+
+    query = {"hostname": hostname}
+    if port is not None:
+        query["port"] = port
 
     try:
         return Site.objects.get(**query)
     except Site.MultipleObjectsReturned as err:
-        raise GraphQLError(
-            f"Your filter `{filter_name}={hostname}` returned "
-            "multiple sites. Try including a port number to disambiguate "
-            f"(e.g. `{filter_name}={hostname}:8000`)."
-        ) from err
+        raise _multiple_sites_error(hostname, filter_name) from err
     except Site.DoesNotExist:
         # This is an expected error, so should not raise a GraphQLError.
         return None
 
 
+def get_request_cache(info, name: str) -> dict:
+    """
+    Return a dictionary scoped to the current GraphQL request, so resolvers
+    can share lookups for the lifetime of a single query.
+
+    The dictionary is kept on the execution context, which is the request when
+    served by the GraphQL view. When there is no context (e.g. when executing the
+    schema directly), a new, throwaway dictionary is returned.
+    """
+    context = getattr(info, "context", None)
+    if context is None:
+        return {}
+
+    try:
+        caches = context._grapple_request_cache
+    except AttributeError:
+        caches = context._grapple_request_cache = {}
+    return caches.setdefault(name, {})
+
+
+def iter_selected_fields(info, selection_sets=None) -> Iterator[FieldNode]:
+    """
+    Yield the fields selected on the value of the field being resolved, through
+    fragments. Fields of nested objects are not included.
+    """
+    if selection_sets is None:
+        selection_sets = [node.selection_set for node in info.field_nodes]
+
+    for selection_set in selection_sets:
+        if selection_set is None:
+            continue
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                yield selection
+            elif isinstance(selection, InlineFragmentNode):
+                yield from iter_selected_fields(info, [selection.selection_set])
+            elif isinstance(selection, FragmentSpreadNode):
+                fragment = info.fragments.get(selection.name.value)
+                if fragment is not None:
+                    yield from iter_selected_fields(info, [fragment.selection_set])
+
+
+def get_site_root_paths(request=None) -> list:
+    """
+    Return Wagtail's site root paths, cached on the request using the same
+    attribute as ``Page._get_site_root_paths`` so that Wagtail's own URL
+    methods benefit from it too.
+    """
+    if request is None:
+        return Site.get_site_root_paths()
+
+    try:
+        return request._wagtail_cached_site_root_paths
+    except AttributeError:
+        request._wagtail_cached_site_root_paths = Site.get_site_root_paths()
+        return request._wagtail_cached_site_root_paths
+
+
+def uses_default_url_routing(model) -> bool:
+    """
+    Check whether URLs for the given page model can be computed from its
+    ``url_path`` alone, i.e. it does not override ``Page.get_url_parts``.
+    """
+    return model is not None and model.get_url_parts is Page.get_url_parts
+
+
+class PageURLResolver:
+    """
+    Compute page URLs from a single site root path table, mirroring
+    ``Page.get_url_parts`` / ``Page.get_url`` for pages using the default routing.
+
+    :param request: The current request, used to cache the site root paths.
+    :param site: The site the URLs are relative to. Pages in this site get a
+                 relative URL, any other page gets an absolute one.
+                 When omitted, URLs are only relative in a single site setup,
+                 as with ``Page.url``.
+    """
+
+    def __init__(self, request=None, site: Optional[Site] = None):
+        self.request = request
+        self.site = site
+        self.root_paths = get_site_root_paths(request)
+        self.num_sites = len({root_path[0] for root_path in self.root_paths})
+        self.use_i18n = getattr(settings, "WAGTAIL_I18N_ENABLED", False)
+        self.append_slash = getattr(settings, "WAGTAIL_APPEND_SLASH", True)
+        self._serve_prefixes = {}
+
+    def _get_serve_prefix(self, language_code: str) -> Optional[str]:
+        """
+        Reverse the ``wagtail_serve`` URL once per language, rather than once per page.
+        Returns ``None`` if the view is not routable (e.g. a headless setup).
+        """
+        if language_code not in self._serve_prefixes:
+            try:
+                if self.use_i18n:
+                    with translation.override(language_code):
+                        prefix = reverse("wagtail_serve", args=("",))
+                else:
+                    prefix = reverse("wagtail_serve", args=("",))
+            except NoReverseMatch:
+                prefix = None
+            self._serve_prefixes[language_code] = prefix
+        return self._serve_prefixes[language_code]
+
+    def get_url_parts(self, url_path: str):
+        """
+        Return a ``(site_id, root_url, page_path)`` tuple for the given ``url_path``,
+        or ``None`` if the page is not routable from any site.
+        """
+        possible_sites = [
+            root_path
+            for root_path in self.root_paths
+            if url_path.startswith(root_path[1])
+        ]
+        if not possible_sites:
+            return None
+
+        site_id, root_path, root_url, language_code = possible_sites[0]
+        if self.site is not None:
+            for candidate in possible_sites:
+                if candidate[0] == self.site.pk:
+                    site_id, root_path, root_url, language_code = candidate
+                    break
+
+        if self.use_i18n:
+            active_language = translation.get_language()
+            try:
+                if (
+                    get_supported_content_language_variant(active_language)
+                    == language_code
+                ):
+                    language_code = active_language
+            except LookupError:
+                pass
+
+        prefix = self._get_serve_prefix(language_code)
+        if prefix is None:
+            return (site_id, None, None)
+
+        page_path = prefix + quote(
+            url_path[len(root_path) :], safe=RFC3986_SUBDELIMS + "/~:@"
+        )
+        if not self.append_slash and page_path != "/":
+            page_path = page_path.rstrip("/")
+
+        return (site_id, root_url, page_path)
+
+    def get_url(self, url_path: str, *, full_url: bool = False) -> Optional[str]:
+        url_parts = self.get_url_parts(url_path)
+        if url_parts is None or url_parts[2] is None:
+            return None
+
+        site_id, root_url, page_path = url_parts
+        if full_url:
+            return root_url + page_path
+        if (self.site is not None and site_id == self.site.pk) or self.num_sites == 1:
+            return page_path
+        return root_url + page_path
+
+    def get_page_url(self, page: Page, *, full_url: bool = False) -> Optional[str]:
+        """
+        Return the URL for a page instance, deferring to the page's own
+        ``get_url`` / ``get_full_url`` when it uses custom routing.
+        """
+        if uses_default_url_routing(type(page)):
+            return self.get_url(page.url_path, full_url=full_url)
+        if full_url:
+            return page.get_full_url(request=self.request)
+        if self.site is None:
+            return page.url
+        return page.get_url(request=self.request, current_site=self.site)
+
+    def get_urls(
+        self, rows: Iterable, *, full_url: bool = False
+    ) -> List[Optional[str]]:
+        """
+        Return the URLs for ``(id, content_type_id, url_path)`` rows, as fetched
+        with ``values_list()``. Pages with custom routing are loaded in bulk and
+        resolved with ``get_page_url``; all others are computed without
+        instantiating a page.
+        """
+        rows = list(rows)
+        custom_routing_ids = [
+            pk
+            for pk, content_type_id, _url_path in rows
+            if not uses_default_url_routing(
+                ContentType.objects.get_for_id(content_type_id).model_class()
+            )
+        ]
+        custom_routing_pages = {}
+        if custom_routing_ids:
+            custom_routing_pages = {
+                page.pk: page
+                for page in Page.objects.filter(pk__in=custom_routing_ids).specific()
+            }
+
+        urls = []
+        for pk, _content_type_id, url_path in rows:
+            if pk in custom_routing_pages:
+                urls.append(
+                    self.get_page_url(custom_routing_pages[pk], full_url=full_url)
+                )
+            else:
+                urls.append(self.get_url(url_path, full_url=full_url))
+        return urls
+
+
+def get_page_url_resolver(info, site: Optional[Site] = None) -> PageURLResolver:
+    """
+    Return a ``PageURLResolver`` shared by all resolvers in the current request.
+    """
+    resolvers = get_request_cache(info, "page_url_resolvers")
+    key = site.pk if site is not None else None
+    if key not in resolvers:
+        resolvers[key] = PageURLResolver(getattr(info, "context", None), site)
+    return resolvers[key]
+
+
+def get_page_by_url_path(
+    queryset, url_path: str, *, site: Optional[Site] = None, scope: Optional[str] = ""
+):
+    """
+    Return the first page in ``queryset`` matching ``url_path``, relative to the
+    root of ``site`` if given, or as a suffix of the page URL path otherwise.
+
+    When the ``ROUTE_CACHE`` setting is enabled, the matching page ID is kept in
+    Django's cache under ``scope`` (which must identify any extra filtering applied
+    to ``queryset``), so that repeated lookups are a primary key fetch rather than
+    a scan of the page table. Pass ``scope=None`` to bypass the cache.
+    """
+    if not url_path.endswith("/"):
+        url_path += "/"
+
+    if site:
+        # Got a site, so make the url_path query as specific as possible
+        url_path = f"{site.root_page.url_path}{url_path.lstrip('/')}"
+        queryset = queryset.filter(url_path=url_path)
+    else:
+        # if the url_path is not specific enough, or the same url_path exists under multiple
+        # site roots, only the first one will be returned.
+        queryset = queryset.filter(url_path__endswith=url_path)
+
+    if scope is None or not grapple_settings.ROUTE_CACHE:
+        return queryset.first()
+
+    site_id = site.pk if site else None
+    if route := get_cached_route(scope, site_id, url_path):
+        # The URL path filter is kept, so a stale route falls through to a full lookup.
+        page = queryset.filter(pk=route[0]).first()
+        if page is not None:
+            return page
+
+    page = queryset.first()
+    if page is not None:
+        set_cached_route(scope, site_id, url_path, page.pk, page.content_type_id)
+    return page
+
+
+def block_contains(block, block_class) -> bool:
+    """
+    Check whether a block, or any of its descendants, is an instance of ``block_class``.
+    The result is kept on the block definition.
+    """
+    try:
+        cache = block._grapple_contains
+    except AttributeError:
+        cache = block._grapple_contains = {}
+
+    try:
+        return cache[block_class]
+    except KeyError:
+        pass
+
+    if isinstance(block, block_class):
+        contains = True
+    elif isinstance(block, blocks.ListBlock):
+        contains = block_contains(block.child_block, block_class)
+    elif isinstance(block, (blocks.BaseStreamBlock, blocks.BaseStructBlock)):
+        contains = any(
+            block_contains(child, block_class) for child in block.child_blocks.values()
+        )
+    else:
+        contains = False
+
+    cache[block_class] = contains
+    return contains
+
+
+def iter_raw_block_values(block, value, block_class) -> Iterator:
+    """
+    Yield the raw (JSON) values of the ``block_class`` blocks found in the raw data
+    of a block, without converting any of it to Python values.
+    """
+    if value is None or not block_contains(block, block_class):
+        return
+
+    if isinstance(block, block_class):
+        yield value
+    elif isinstance(block, blocks.BaseStreamBlock):
+        for child in value:
+            child_block = block.child_blocks.get(child.get("type"))
+            if child_block is not None:
+                yield from iter_raw_block_values(
+                    child_block, child.get("value"), block_class
+                )
+    elif isinstance(block, blocks.BaseStructBlock):
+        for name, child_block in block.child_blocks.items():
+            yield from iter_raw_block_values(child_block, value.get(name), block_class)
+    elif isinstance(block, blocks.ListBlock):
+        for item in value:
+            # Since Wagtail 2.16, list items are {"type": "item", "value": ..., "id": ...}
+            if isinstance(item, dict) and item.get("type") == "item":
+                item = item.get("value")
+            yield from iter_raw_block_values(block.child_block, item, block_class)
+
+
 def _sliced_queryset(qs, limit=None, offset=None):
     offset = int(offset or 0)
     # default
@@ -167,7 +632,22 @@ def resolve_queryset(
         if connection.vendor != "sqlite":
             qs = qs.annotate_score("search_score")
 
-    return _sliced_queryset(qs, limit, offset)
+    qs = _sliced_queryset(qs, limit, offset)
+    get_request_cache(info, "resolved_querysets").setdefault("pending", []).append(qs)
+    return qs
+
+
+def pop_resolved_objects(info) -> Iterator:
+    """
+    Yield the objects of the query sets resolved by ``resolve_queryset`` in the
+    current request since the last call, so resolvers can batch lookups over the
+    whole lists their objects come from. Query sets keep their results, so the
+    executor reuses them.
+    """
+    cache = get_request_cache(info, "resolved_querysets")
+    querysets, cache["pending"] = cache.get("pending", []), []
+    for qs in querysets:
+        yield from qs
 
 
 def get_paginated_result(qs, page, per_page):
@@ -272,6 +752,18 @@ def resolve_paginated_queryset(
 
 
 def get_media_item_url(cls):
+    return get_media_item_urls([cls])[0]
+
+
+def get_media_item_urls(items: Iterable) -> List[str]:
+    """
+    Return the URLs of media items, with one cache lookup for all of them when
+    ``MEDIA_URL_CACHE_TIMEOUT`` is set.
+    """
+    return get_cached_media_urls(items, _get_media_item_url)
+
+
+def _get_media_item_url(cls):
     url = ""
     if hasattr(cls, "url"):
         url = cls.url
@@ -6,6 +6,7 @@ from .registry import registry
 from .types.collections import CollectionsQuery
 from .types.documents import DocumentsQuery
 from .types.images import ImagesQuery
+from .types.menus import MenusQuery
 from .types.pages import PagesQuery
 from .types.redirects import RedirectsQuery
 from .types.search import SearchQuery
@@ -20,6 +21,7 @@ def register_schema_query(query_mixins):
     query_mixins += [
         ObjectType,
         PagesQuery(),
+        MenusQuery(),
         SitesQuery(),
         ImagesQuery(),
         DocumentsQuery(),
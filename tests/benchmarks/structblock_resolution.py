@@ -0,0 +1,74 @@
+"""
+Time the resolution of the children of a 50-field StructBlock in a 20-item
+ListBlock, with the child block map, against the previous per-field lookup.
+
+Run from the ``tests`` directory::
+
+    python benchmarks/structblock_resolution.py
+"""
+
+import os
+import sys
+import timeit
+
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "settings")
+
+import django  # noqa: E402
+
+
+django.setup()
+
+from wagtail import blocks  # noqa: E402
+
+from grapple.types.streamfield import ListBlock as ListBlockType  # noqa: E402
+from grapple.types.streamfield import StructBlock as StructBlockType  # noqa: E402
+from grapple.types.streamfield import StructBlockItem  # noqa: E402
+
+
+FIELDS = 50
+ROWS = 20
+NUMBER = 200
+
+
+def resolve_blocks_per_field_lookup(item):
+    # The lookup StructBlock.resolve_blocks used to make for each field.
+    stream_blocks = []
+    child_blocks = item.block.child_blocks
+    for field, value in item.value.items():
+        block = dict(child_blocks)[field]
+        if isinstance(value, int) and (
+            issubclass(type(block), blocks.ChooserBlock)
+            or not issubclass(type(block), blocks.StructBlock)
+        ):
+            value = block.to_python(value)
+        stream_blocks.append(StructBlockItem(field, block, value))
+    return stream_blocks
+
+
+def main():
+    field_names = [f"field_{i}" for i in range(FIELDS)]
+    struct_block = blocks.StructBlock(
+        [(name, blocks.CharBlock()) for name in field_names]
+    )
+    list_block = blocks.ListBlock(struct_block)
+    value = list_block.to_python(
+        [{name: f"{name}-{row}" for name in field_names} for row in range(ROWS)]
+    )
+    items = ListBlockType.resolve_items(
+        StructBlockItem("list", list_block, value), None
+    )
+
+    for name, resolve in (
+        ("per-field lookup", resolve_blocks_per_field_lookup),
+        ("child block map", lambda item: StructBlockType.resolve_blocks(item, None)),
+    ):
+        seconds = timeit.timeit(
+            lambda resolve=resolve: [resolve(item) for item in items], number=NUMBER
+        )
+        sys.stdout.write(f"{name}: {seconds / NUMBER * 1000:.3f} ms per ListBlock\n")
+
+
+if __name__ == "__main__":
+    main()
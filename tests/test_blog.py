@@ -2,14 +2,19 @@ import datetime
 import decimal
 import json
 
+from unittest import mock
+
 import wagtail_factories
 
 from django.conf import settings
 from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.core.validators import URLValidator
+from django.db import connection
 from django.test import override_settings
 from django.test.client import RequestFactory
+from django.test.utils import CaptureQueriesContext
 from test_grapple import BaseGrappleTest
 from testapp.blocks import (
     ButtonBlock,
@@ -23,11 +28,15 @@ from testapp.factories import (
     PersonFactory,
     TextWithCallableBlockFactory,
 )
-from wagtail.blocks import CharBlock, StreamValue
+from testapp.models import BlogPage
+from wagtail.blocks import CharBlock, StreamBlock, StreamValue
 from wagtail.blocks.list_block import ListBlock, ListValue
 from wagtail.embeds.blocks import EmbedValue
+from wagtail.images.blocks import ImageChooserBlock
 from wagtail.rich_text import RichText
 
+from grapple.types.streamfield import defer_list_blocks, filter_stream_value
+
 
 class BlogTest(BaseGrappleTest):
     def setUp(self):
@@ -149,6 +158,66 @@ class BlogTest(BaseGrappleTest):
         # Check title.
         self.assertEqual(executed["data"]["page"]["title"], self.blog_page.title)
 
+    def test_image_ref_chooser_field(self):
+        image = wagtail_factories.ImageFactory(title="Hero")
+        image.get_rendition("width-100")
+        blog_page = BlogPageFactory(parent=self.home, hero_image=image)
+        query = """
+        query($id: ID) {
+            page(id: $id) {
+                ... on BlogPage {
+                    heroImageRef {
+                        id
+                        title
+                        renditionUrl(width: 100)
+                    }
+                }
+            }
+        }
+        """
+        executed = self.client.execute(query, variables={"id": blog_page.id})
+
+        hero_image_ref = executed["data"]["page"]["heroImageRef"]
+        self.assertEqual(int(hero_image_ref["id"]), image.pk)
+        self.assertEqual(hero_image_ref["title"], "Hero")
+        self.assertIn("width-100", hero_image_ref["renditionUrl"])
+
+    def test_image_ref_chooser_fields_of_a_page_list(self):
+        # Wagtail caches renditions by image ID, which other tests reuse.
+        cache.clear()
+        for i in range(4):
+            image = wagtail_factories.ImageFactory(title=f"Hero {i}")
+            image.get_rendition("width-100")
+            BlogPageFactory(parent=self.home, hero_image=image)
+        query = """
+        {
+            pages {
+                ... on BlogPage {
+                    title
+                    %s
+                }
+            }
+        }
+        """
+        with CaptureQueriesContext(connection) as title_queries:
+            self.client.execute(query % "")
+
+        # The image rows, then the renditions, of all the pages.
+        with self.assertNumQueries(len(title_queries) + 2):
+            executed = self.client.execute(
+                query % "heroImageRef { title renditionUrl(width: 100) }"
+            )
+
+        hero_image_refs = [
+            page["heroImageRef"]
+            for page in executed["data"]["pages"]
+            if page.get("heroImageRef")
+        ]
+        self.assertEqual(
+            sorted(ref["title"] for ref in hero_image_refs),
+            [f"Hero {i}" for i in range(4)],
+        )
+
     def test_related_author_page(self):
         query = """
         query($id: ID) {
@@ -1094,7 +1163,9 @@ class BlogTest(BaseGrappleTest):
             "hostname": site_two.hostname,
             "id": the_post.id,
         }
-        results = self.client.execute(query, variables=query_variables)
+        results = self.client.execute(
+            query, variables=query_variables, context_value=None
+        )
 
         data = results["data"]["site"]["page"]
         self.assertEqual(data["title"], the_post.title)
@@ -1150,6 +1221,193 @@ class BlogTest(BaseGrappleTest):
             self.blog_page.custom_property,
         )
 
+    def get_body_blocks(self, arguments):
+        query = f"""
+        query($id: ID) {{
+            page(id: $id) {{
+                ... on BlogPage {{
+                    body({arguments}) {{
+                        id
+                        field
+                    }}
+                }}
+            }}
+        }}
+        """
+        executed = self.client.execute(query, variables={"id": self.blog_page.id})
+        self.assertNotIn("errors", executed)
+        return executed["data"]["page"]["body"]
+
+    def test_streamfield_block_types_filter(self):
+        query_blocks = self.get_body_blocks('blockTypes: ["heading"]')
+        self.assertEqual(
+            [block["id"] for block in query_blocks],
+            [
+                block.id
+                for block in self.blog_page.body
+                if block.block_type == "heading"
+            ],
+        )
+        self.assertEqual({block["field"] for block in query_blocks}, {"heading"})
+
+    def test_streamfield_limit_and_offset(self):
+        query_blocks = self.get_body_blocks("limit: 2, offset: 1")
+        self.assertEqual(
+            [block["id"] for block in query_blocks],
+            [block.id for block in self.blog_page.body][1:3],
+        )
+
+        query_blocks = self.get_body_blocks('blockTypes: ["heading"], offset: 1')
+        self.assertEqual(
+            [block["id"] for block in query_blocks],
+            [
+                block.id
+                for block in self.blog_page.body
+                if block.block_type == "heading"
+            ][1:],
+        )
+
+    def test_streamfield_filter_skips_decoding(self):
+        body = BlogPage.objects.get(pk=self.blog_page.pk).body
+        filtered = filter_stream_value(body, block_types=["heading"])
+
+        # Converting the remaining blocks does not touch the image chooser blocks.
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                [block.value for block in filtered],
+                ["Test heading 1", "Test heading 2"],
+            )
+
+    def test_list_block_items_slice(self):
+        page = BlogPageFactory(
+            parent=self.home,
+            body=[
+                (
+                    "objectives",
+                    ListValue(
+                        ListBlock(CharBlock()), values=["One", "Two", "Three", "Four"]
+                    ),
+                )
+            ],
+        )
+        query_blocks = self.get_blocks_from_body(
+            "ListBlock",
+            block_query="""
+            totalCount
+            items(limit: 2, offset: 1) {
+                ...on CharBlock {
+                    value
+                }
+            }
+            """,
+            page_id=page.id,
+        )
+
+        self.assertEqual(query_blocks[0]["totalCount"], 4)
+        self.assertEqual(
+            [item["value"] for item in query_blocks[0]["items"]], ["Two", "Three"]
+        )
+
+    def test_list_block_slice_skips_decoding(self):
+        images = [wagtail_factories.ImageFactory() for _i in range(3)]
+        stream_block = StreamBlock([("images", ListBlock(ImageChooserBlock()))])
+        value = defer_list_blocks(
+            StreamValue(
+                stream_block,
+                [{"type": "images", "value": [image.pk for image in images]}],
+                is_lazy=True,
+            )
+        )
+        list_value = value[0].value
+        child_block = stream_block.child_blocks["images"].child_block
+
+        with mock.patch.object(
+            child_block, "bulk_to_python", wraps=child_block.bulk_to_python
+        ) as bulk_to_python:
+            self.assertEqual(len(list_value), 3)
+            self.assertEqual(list(list_value.get_slice(1, 1)), [images[1]])
+
+        bulk_to_python.assert_called_once_with([images[1].pk])
+
+    def test_deferring_list_blocks_keeps_the_stream_value_lazy(self):
+        stream_block = StreamBlock(
+            [("heading", CharBlock()), ("items", ListBlock(CharBlock()))]
+        )
+        raw_data = [
+            {"type": "heading", "value": "Heading", "id": "1"},
+            {"type": "items", "value": ["One", "Two"], "id": "2"},
+        ]
+        stream_value = StreamValue(stream_block, raw_data, is_lazy=True)
+
+        self.assertIs(defer_list_blocks(stream_value), stream_value)
+        self.assertEqual(list(stream_value.raw_data), raw_data)
+        # Only the children containing ListBlocks are converted.
+        self.assertIsNone(stream_value._bound_blocks[0])
+        self.assertEqual(len(stream_value[1].value), 2)
+
+    def test_stream_block_blocks_slice(self):
+        query_blocks = self.get_blocks_from_body(
+            "CarouselBlock",
+            block_query="""
+            totalCount
+            blocks(limit: 1, offset: 1) {
+                id
+            }
+            """,
+        )
+
+        carousel = next(
+            block for block in self.blog_page.body if block.block_type == "carousel"
+        )
+        self.assertEqual(query_blocks[0]["totalCount"], 2)
+        self.assertEqual(
+            [block["id"] for block in query_blocks[0]["blocks"]], [carousel.value[1].id]
+        )
+
+    def test_raw_streamfield(self):
+        query = """
+        query($id: ID) {
+            page(id: $id) {
+                ... on BlogPage {
+                    rawBody
+                    firstHeading: rawBody(blockTypes: ["heading"], limit: 1)
+                }
+            }
+        }
+        """
+        executed = self.client.execute(query, variables={"id": self.blog_page.id})
+        self.assertNotIn("errors", executed)
+        page = executed["data"]["page"]
+
+        body = BlogPage.objects.get(pk=self.blog_page.pk).body
+        self.assertEqual(page["rawBody"], list(body.raw_data))
+        self.assertEqual(
+            page["firstHeading"],
+            [{"type": "heading", "value": "Test heading 1", "id": body[0].id}],
+        )
+
+    def test_raw_streamfield_skips_blocks(self):
+        query = """
+        query($id: ID) {
+            page(id: $id) {
+                ... on BlogPage {
+                    %s
+                }
+            }
+        }
+        """
+        variables = {"id": self.blog_page.id}
+        with CaptureQueriesContext(connection) as title_queries:
+            self.client.execute(query % "title", variables=variables)
+
+        with mock.patch(
+            "grapple.types.streamfield.bulk_to_python_deferred"
+        ) as bulk_to_python_deferred, self.assertNumQueries(len(title_queries)):
+            executed = self.client.execute(query % "rawBody", variables=variables)
+
+        self.assertNotIn("errors", executed)
+        bulk_to_python_deferred.assert_not_called()
+
     def test_stream_block_description(self):
         """
         A StreamBlock with a graphql_description field in its Metaclass should have that value exposed
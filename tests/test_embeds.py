@@ -0,0 +1,120 @@
+from django.test import RequestFactory, TestCase, override_settings
+from test_grapple import BaseGrappleTest
+from testapp.embed_finders import LocalOEmbedFinder
+from testapp.factories import BlogPageFactory
+from wagtail.embeds.blocks import EmbedValue
+from wagtail.embeds.embeds import get_embed_hash
+from wagtail.embeds.models import Embed
+
+from grapple.embeds import (
+    EmbedLoader,
+    collect_embed_urls,
+    fetch_embeds,
+    get_embed_executor,
+)
+
+
+EMBED_FINDERS = [{"class": "testapp.embed_finders.LocalOEmbedFinder"}]
+
+
+@override_settings(
+    WAGTAILEMBEDS_FINDERS=EMBED_FINDERS,
+    GRAPPLE={"APPS": ["testapp"], "EMBED_FETCH_TIMEOUT": 0.2},
+)
+class EmbedLoaderTest(TestCase):
+    def setUp(self):
+        LocalOEmbedFinder.requested_urls = []
+
+    def test_existing_embeds_are_loaded_in_one_query(self):
+        urls = [f"https://embed.test/{i}/" for i in range(3)]
+        for url in urls:
+            Embed.objects.create(
+                url=url, hash=get_embed_hash(url), type="video", html=url
+            )
+
+        loader = EmbedLoader()
+        loader.prime(urls)
+        with self.assertNumQueries(1):
+            for url in urls:
+                self.assertEqual(loader.get(url).html, url)
+
+        self.assertEqual(LocalOEmbedFinder.requested_urls, [])
+
+    def test_misses_are_fetched_and_stored(self):
+        url = "https://embed.test/new/"
+
+        embed = EmbedLoader().get(url)
+        self.assertEqual(embed.html, f'<iframe src="{url}"></iframe>')
+        self.assertTrue(Embed.objects.filter(hash=get_embed_hash(url)).exists())
+        self.assertEqual(LocalOEmbedFinder.requested_urls, [url])
+
+    def test_missing_and_slow_providers_fall_back_to_no_embed(self):
+        embeds = fetch_embeds(
+            [
+                "https://embed.test/missing/",
+                "https://embed.test/slow/",
+                "https://embed.test/fast/",
+            ]
+        )
+
+        self.assertIsNone(embeds["https://embed.test/missing/"])
+        self.assertIsNone(embeds["https://embed.test/slow/"])
+        self.assertIsNotNone(embeds["https://embed.test/fast/"])
+
+    def test_requests_share_the_executor(self):
+        executor = get_embed_executor()
+        fetch_embeds(["https://embed.test/fast/"])
+        self.assertIs(get_embed_executor(), executor)
+
+    def test_unsupported_provider(self):
+        self.assertIsNone(EmbedLoader().get("https://unknown.example.com/video"))
+
+
+@override_settings(WAGTAILEMBEDS_FINDERS=EMBED_FINDERS)
+class EmbedBlockTest(BaseGrappleTest):
+    def setUp(self):
+        super().setUp()
+        LocalOEmbedFinder.requested_urls = []
+        self.urls = [f"https://embed.test/video-{i}/" for i in range(3)]
+        self.blog_page = BlogPageFactory(
+            parent=self.home,
+            body=[("video", {"youtube_link": EmbedValue(url)}) for url in self.urls],
+        )
+
+    def test_collect_embed_urls(self):
+        body = self.blog_page.body
+        self.assertEqual(
+            list(collect_embed_urls(body.stream_block, list(body.raw_data))),
+            self.urls,
+        )
+
+    def test_embeds_are_fetched_once_per_request(self):
+        query = """
+        query($id: ID) {
+            page(id: $id) {
+                ... on BlogPage {
+                    body {
+                        ... on VideoBlock {
+                            youtubeLink {
+                                embed
+                                rawEmbed
+                            }
+                        }
+                    }
+                }
+            }
+        }
+        """
+        executed = self.client.execute(
+            query,
+            variables={"id": self.blog_page.id},
+            context_value=RequestFactory().get("/graphql"),
+        )
+        self.assertNotIn("errors", executed)
+
+        embeds = [block["youtubeLink"] for block in executed["data"]["page"]["body"]]
+        self.assertEqual(
+            [embed["embed"] for embed in embeds],
+            [f'<iframe src="{url}"></iframe>' for url in self.urls],
+        )
+        self.assertEqual(sorted(LocalOEmbedFinder.requested_urls), self.urls)
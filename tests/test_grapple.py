@@ -1,14 +1,18 @@
 import unittest
 
+from io import StringIO
 from pydoc import locate
 from unittest.mock import patch
 
 import wagtail_factories
 
 from django.conf import settings
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
 from django.db import connection
 from django.test import RequestFactory, TestCase, override_settings
+from django.utils import translation
 from graphene.test import Client
 from testapp.factories import AdvertFactory, BlogPageFactory, PersonFactory
 from testapp.models import GlobalSocialMediaSettings, HomePage, SocialMediaSettings
@@ -16,8 +20,11 @@ from wagtail.documents import get_document_model
 from wagtail.models import Page, Site
 from wagtailmedia.models import get_media_model
 
+from grapple.cache import get_cached_route, invalidate_routes
 from grapple.registry import RegistryItem
 from grapple.schema import create_schema
+from grapple.types.menus import menu_tree_cache
+from grapple.utils import get_media_item_url
 
 
 SCHEMA = locate(settings.GRAPHENE["SCHEMA"])
@@ -27,13 +34,29 @@ MIDDLEWARE_OBJECTS = [
 MIDDLEWARE = [item() if isinstance(item, type) else item for item in MIDDLEWARE_OBJECTS]
 
 
+NEW_REQUEST = object()
+
+
+class GrappleClient(Client):
+    """
+    A test client executing each query with a new request as context, as the
+    GraphQL view does, so request-scoped caches last for one execution. Pass
+    ``context_value=None`` to execute a query without context.
+    """
+
+    def execute(self, *args, context_value=NEW_REQUEST, **kwargs):
+        if context_value is NEW_REQUEST:
+            context_value = RequestFactory().post("/graphql/")
+        return super().execute(*args, context_value=context_value, **kwargs)
+
+
 class BaseGrappleTest(TestCase):
     @classmethod
     def setUpTestData(cls):
         cls.home = HomePage.objects.first()
 
     def setUp(self):
-        self.client = Client(SCHEMA, middleware=MIDDLEWARE)
+        self.client = GrappleClient(SCHEMA, middleware=MIDDLEWARE)
 
 
 class BaseGrappleTestWithIntrospection(BaseGrappleTest):
@@ -740,6 +763,288 @@ class PageUrlPathTest(BaseGrappleTest):
             self.assertEqual(int(page_data["id"]), another_child.id)
 
 
+class RouteCacheTest(BaseGrappleTest):
+    query = """
+    query($urlPath: String) {
+        page(urlPath: $urlPath) {
+            id
+        }
+    }
+    """
+
+    def setUp(self):
+        super().setUp()
+        invalidate_routes()
+        self.page = BlogPageFactory(slug="post", parent=self.home)
+
+    def _query_by_path(self, path):
+        executed = self.client.execute(self.query, variables={"urlPath": path})
+        page_data = executed["data"]["page"]
+        return int(page_data["id"]) if page_data else None
+
+    @override_settings(GRAPPLE={"ROUTE_CACHE": True})
+    def test_route_is_cached(self):
+        self.assertEqual(self._query_by_path("/post"), self.page.pk)
+        self.assertEqual(
+            get_cached_route("", None, "/post/"),
+            (self.page.pk, self.page.content_type_id),
+        )
+        self.assertEqual(self._query_by_path("/post/"), self.page.pk)
+
+    @override_settings(GRAPPLE={"ROUTE_CACHE": True})
+    def test_route_invalidated_on_unpublish(self):
+        self.assertEqual(self._query_by_path("/post/"), self.page.pk)
+        self.page.unpublish()
+        self.assertIsNone(get_cached_route("", None, "/post/"))
+        self.assertIsNone(self._query_by_path("/post/"))
+
+    @override_settings(GRAPPLE={"ROUTE_CACHE": True})
+    def test_route_invalidated_on_slug_change(self):
+        self.assertEqual(self._query_by_path("/post/"), self.page.pk)
+        self.page.slug = "renamed"
+        self.page.save_revision().publish()
+        self.assertIsNone(self._query_by_path("/post/"))
+        self.assertEqual(self._query_by_path("/renamed/"), self.page.pk)
+
+    @override_settings(GRAPPLE={"ROUTE_CACHE": True})
+    def test_warm_route_cache(self):
+        site = Site.objects.get(is_default_site=True)
+        call_command("grapple_warm_route_cache", stdout=StringIO())
+        self.assertEqual(
+            get_cached_route("", site.pk, self.page.url_path),
+            (self.page.pk, self.page.content_type_id),
+        )
+
+
+class PageUrlsTest(BaseGrappleTest):
+    def setUp(self):
+        super().setUp()
+        self.factory = RequestFactory()
+        self.parent = BlogPageFactory(slug="parent", parent=self.home)
+        self.child = BlogPageFactory(slug="child", parent=self.parent)
+
+    def test_page_url_matches_wagtail(self):
+        query = """
+        query($id: ID) {
+            page(id: $id) {
+                url
+            }
+        }
+        """
+
+        executed = self.client.execute(query, variables={"id": self.child.id})
+        self.assertEqual(executed["data"]["page"]["url"], self.child.url)
+
+    def test_page_urls(self):
+        query = """
+        {
+            pageUrls
+        }
+        """
+        executed = self.client.execute(query)
+
+        pages = Page.objects.live().public().filter(depth__gt=1)
+        self.assertEqual(executed["data"]["pageUrls"], [page.url for page in pages])
+
+    def test_page_urls_full_url(self):
+        query = """
+        query($parent: ID) {
+            pageUrls(parent: $parent, fullUrl: true)
+        }
+        """
+        executed = self.client.execute(query, variables={"parent": self.parent.id})
+        self.assertEqual(executed["data"]["pageUrls"], [self.child.full_url])
+
+    def test_page_urls_in_site(self):
+        query = """
+        {
+            pageUrls(inSite: true)
+        }
+        """
+        request = self.factory.get("/")
+        executed = self.client.execute(query, context_value=request)
+
+        site = Site.find_for_request(request)
+        pages = Page.objects.in_site(site).live().public().filter(depth__gt=1)
+        self.assertEqual(
+            executed["data"]["pageUrls"],
+            [page.get_url(request=request, current_site=site) for page in pages],
+        )
+
+    def test_page_urls_site_returns_empty_list_when_no_site_found(self):
+        query = """
+        {
+            pageUrls(site: "does.not.exist")
+        }
+        """
+        executed = self.client.execute(query)
+        self.assertEqual(executed["data"]["pageUrls"], [])
+
+
+class PageIndexTest(BaseGrappleTest):
+    def setUp(self):
+        super().setUp()
+        self.pages = [
+            BlogPageFactory(slug=f"post-{i}", parent=self.home) for i in range(3)
+        ]
+
+    def test_page_index(self):
+        query = """
+        {
+            pageIndex {
+                id
+                contentType
+                urlPath
+                url
+                lastPublishedAt
+                locale
+            }
+        }
+        """
+        executed = self.client.execute(query)
+        entries = executed["data"]["pageIndex"]
+
+        pages = Page.objects.live().public().filter(depth__gt=1).order_by("pk")
+        self.assertEqual([int(entry["id"]) for entry in entries], [p.pk for p in pages])
+
+        entry = entries[-1]
+        post = self.pages[-1]
+        self.assertEqual(entry["contentType"], "testapp.BlogPage")
+        self.assertEqual(entry["urlPath"], post.url_path)
+        self.assertEqual(entry["url"], post.url)
+        self.assertEqual(entry["locale"], post.locale.language_code)
+
+    def test_page_index_keyset_pagination(self):
+        query = """
+        query($after: ID, $contentType: String) {
+            pageIndex(after: $after, contentType: $contentType, limit: 2) {
+                id
+            }
+        }
+        """
+        executed = self.client.execute(
+            query, variables={"contentType": "testapp.BlogPage"}
+        )
+        first_batch = [int(entry["id"]) for entry in executed["data"]["pageIndex"]]
+        self.assertEqual(first_batch, [page.pk for page in self.pages[:2]])
+
+        executed = self.client.execute(
+            query,
+            variables={"after": first_batch[-1], "contentType": "testapp.BlogPage"},
+        )
+        second_batch = [int(entry["id"]) for entry in executed["data"]["pageIndex"]]
+        self.assertEqual(second_batch, [self.pages[2].pk])
+
+    @override_settings(GRAPPLE={"PAGE_INDEX_MAX_SIZE": 2})
+    def test_page_index_max_size(self):
+        query = """
+        {
+            pageIndex(limit: 50) {
+                id
+            }
+        }
+        """
+        executed = self.client.execute(query)
+        self.assertEqual(len(executed["data"]["pageIndex"]), 2)
+
+
+class MenuTreeTest(BaseGrappleTest):
+    query = """
+    query($rootPage: ID, $depth: PositiveInt, $inMenu: Boolean) {
+        menuTree(rootPage: $rootPage, depth: $depth, inMenu: $inMenu) {
+            id
+            title
+            url
+            children {
+                id
+                children {
+                    id
+                }
+            }
+        }
+    }
+    """
+
+    def setUp(self):
+        super().setUp()
+        menu_tree_cache.invalidate()
+        self.section = BlogPageFactory(
+            title="Section", parent=self.home, show_in_menus=True
+        )
+        self.child = BlogPageFactory(parent=self.section, show_in_menus=True)
+        self.hidden_child = BlogPageFactory(parent=self.section, show_in_menus=False)
+        self.grandchild = BlogPageFactory(parent=self.child, show_in_menus=True)
+        self.hidden = BlogPageFactory(parent=self.home, show_in_menus=False)
+
+    def get_menu_tree(self, **variables):
+        executed = self.client.execute(
+            self.query, variables={"rootPage": self.home.pk, **variables}
+        )
+        self.assertNotIn("errors", executed)
+        return executed["data"]["menuTree"]
+
+    def test_menu_tree(self):
+        tree = self.get_menu_tree()
+        self.assertEqual([int(item["id"]) for item in tree], [self.section.pk])
+        self.assertEqual(tree[0]["title"], "Section")
+        self.assertEqual(tree[0]["url"], self.section.url)
+        self.assertEqual(
+            [int(item["id"]) for item in tree[0]["children"]], [self.child.pk]
+        )
+        # The default depth is 2
+        self.assertEqual(tree[0]["children"][0]["children"], [])
+
+    def test_menu_tree_depth(self):
+        tree = self.get_menu_tree(depth=3)
+        self.assertEqual(
+            [int(item["id"]) for item in tree[0]["children"][0]["children"]],
+            [self.grandchild.pk],
+        )
+
+        tree = self.get_menu_tree(depth=1)
+        self.assertEqual(tree[0]["children"], [])
+
+    def test_menu_tree_all_pages(self):
+        tree = self.get_menu_tree(inMenu=None)
+        self.assertEqual(
+            [int(item["id"]) for item in tree], [self.section.pk, self.hidden.pk]
+        )
+        self.assertEqual(
+            [int(item["id"]) for item in tree[0]["children"]],
+            [self.child.pk, self.hidden_child.pk],
+        )
+
+    def test_menu_tree_default_root(self):
+        tree = self.get_menu_tree(rootPage=None)
+        self.assertEqual([int(item["id"]) for item in tree], [self.section.pk])
+
+    @override_settings(GRAPPLE={"MENU_TREE_CACHE": True})
+    def test_menu_tree_cache(self):
+        self.get_menu_tree()
+        # Only the root page is fetched
+        with self.assertNumQueries(1):
+            tree = self.get_menu_tree()
+        self.assertEqual([int(item["id"]) for item in tree], [self.section.pk])
+
+        self.hidden.show_in_menus = True
+        self.hidden.save_revision().publish()
+
+        tree = self.get_menu_tree()
+        self.assertEqual(
+            [int(item["id"]) for item in tree], [self.section.pk, self.hidden.pk]
+        )
+
+    @override_settings(GRAPPLE={"MENU_TREE_CACHE": True})
+    def test_menu_tree_cache_is_keyed_by_language(self):
+        menu_tree_cache.invalidate()
+        with translation.override("en"):
+            self.get_menu_tree()
+        with translation.override("fr"):
+            self.get_menu_tree()
+
+        self.assertEqual({key[-1] for key in menu_tree_cache._get_data()}, {"en", "fr"})
+
+
 class SitesTest(TestCase):
     def setUp(self):
         self.site = wagtail_factories.SiteFactory(
@@ -1279,6 +1584,26 @@ class DocumentsTest(BaseGrappleTest):
         )
         settings.WAGTAILDOCS_SERVE_METHOD = serve_method_at_test_start
 
+    @override_settings(GRAPPLE={"MEDIA_URL_CACHE_TIMEOUT": 60})
+    def test_cached_urls_of_documents_sharing_a_file(self):
+        cache.clear()
+        # Served by the document serve view, so the URL depends on the document.
+        other_document = self.document_model(
+            title="Other File",
+            file=self.example_document.file.name,
+            file_hash=self.example_document.file_hash,
+        )
+        other_document.save()
+
+        self.assertEqual(
+            get_media_item_url(self.example_document),
+            "http://localhost:8000" + self.example_document.url,
+        )
+        self.assertEqual(
+            get_media_item_url(other_document),
+            "http://localhost:8000" + other_document.url,
+        )
+
     def tearDown(self):
         self.example_document.file.delete()
 
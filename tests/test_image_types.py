@@ -1,16 +1,48 @@
+from concurrent.futures import Future
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock
+
 import wagtail_factories
 
-from django.test import override_settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.storage import FileSystemStorage
+from django.core.management import call_command
+from django.test import RequestFactory, override_settings
 from test_grapple import BaseGrappleTestWithIntrospection
+from testapp.models import BlogPage
+from testapp.rendition_backends import RecordingRenditionBackend
 from wagtail.images import get_image_model
 from wagtail.images.tests.utils import get_test_image_file_svg
 
-from grapple.types.images import rendition_allowed
+from grapple.management.commands.grapple_generate_renditions import (
+    collect_manifest_specs,
+)
+from grapple.renditions import (
+    ProcessPoolRenditionBackend,
+    RenditionLoader,
+    canonical_filter_spec,
+)
+from grapple.types.images import (
+    ImageRefObjectType,
+    get_instance_image_ref,
+    rendition_allowed,
+)
+from grapple.utils import get_media_item_url, get_request_cache
 
 
 Image = get_image_model()
 
 
+class CountingStorage(FileSystemStorage):
+    url_calls = 0
+
+    def url(self, name):
+        CountingStorage.url_calls += 1
+        return super().url(name)
+
+
 class ImageTypesTest(BaseGrappleTestWithIntrospection):
     @classmethod
     def setUpTestData(cls):
@@ -147,6 +179,62 @@ class ImageTypesTest(BaseGrappleTestWithIntrospection):
         self.assertIn("width-100.format-webp.webp", data["srcSet"])
         self.assertIn("width-300.format-webp.webp", data["srcSet"])
 
+    def test_image_sources(self):
+        # Wider than the renditions, as Wagtail does not upscale images.
+        image = wagtail_factories.ImageFactory(file__width=400, file__height=200)
+        image.get_renditions(
+            "fill-100x50|format-webp",
+            "fill-200x100|format-webp",
+            "fill-100x50",
+            "fill-200x100",
+        )
+        query = """
+        query ($id: ID!) {
+            image(id: $id) {
+                imageSources(widths: [100, 200], formats: ["webp", null], fill: "2x1") {
+                    format
+                    size
+                    width
+                    height
+                    url
+                }
+            }
+        }
+        """
+        with self.assertNumQueries(2):
+            sources = self.client.execute(query, variables={"id": image.id})["data"][
+                "image"
+            ]["imageSources"]
+
+        self.assertEqual(
+            [
+                (source["format"], source["size"], source["width"], source["height"])
+                for source in sources
+            ],
+            [
+                ("webp", 100, 100, 50),
+                ("webp", 200, 200, 100),
+                (None, 100, 100, 50),
+                (None, 200, 200, 100),
+            ],
+        )
+        self.assertIn("fill-100x50.format-webp.webp", sources[0]["url"])
+        self.assertIn("fill-200x100", sources[3]["url"])
+
+    @override_settings(GRAPPLE={"ALLOWED_IMAGE_FILTERS": ["width-100"]})
+    def test_image_sources_disallowed_filters(self):
+        query = """
+        query ($id: ID!) {
+            image(id: $id) {
+                imageSources(widths: [200], formats: ["webp"]) {
+                    url
+                }
+            }
+        }
+        """
+        executed = self.client.execute(query, variables={"id": self.example_image.id})
+        self.assertEqual(executed["data"]["image"]["imageSources"], [])
+
     def test_src_set_invalid_format(self):
         """
         Ensure that an exception is raised when image format is not of valid type.
@@ -200,6 +288,339 @@ class ImageTypesTest(BaseGrappleTestWithIntrospection):
             self.assertFalse(rendition_allowed("width-100"))
             self.assertFalse(rendition_allowed("fill-100x100"))
 
+    def test_canonical_filter_spec(self):
+        self.assertEqual(
+            canonical_filter_spec("format-webp|jpegquality-60|fill-300x150"),
+            "fill-300x150|format-webp|jpegquality-60",
+        )
+        self.assertEqual(
+            canonical_filter_spec("custom-1|width-100"), "custom-1|width-100"
+        )
+
+    def test_canonical_filter_spec_keeps_resize_order(self):
+        self.assertEqual(
+            canonical_filter_spec("width-50|format-webp|fill-100x100"),
+            "width-50|fill-100x100|format-webp",
+        )
+        self.assertEqual(
+            canonical_filter_spec("fill-100x100|width-50"), "fill-100x100|width-50"
+        )
+
+    def test_rendition_argument_order(self):
+        query = """
+        query ($id: ID!) {
+            image(id: $id) {
+                first: rendition(width: 200, format: "webp") {
+                    id
+                    filterSpec
+                }
+                second: rendition(format: "webp", width: 200) {
+                    id
+                }
+            }
+        }
+        """
+        data = self.client.execute(query, variables={"id": self.example_image.id})[
+            "data"
+        ]["image"]
+
+        self.assertEqual(data["first"]["filterSpec"], "width-200|format-webp")
+        self.assertEqual(data["first"]["id"], data["second"]["id"])
+
+    @override_settings(GRAPPLE={"ALLOWED_IMAGE_FILTERS": ["format-webp|width-200"]})
+    def test_rendition_allowed_in_any_order(self):
+        self.assertTrue(rendition_allowed("width-200|format-webp"))
+        self.assertTrue(rendition_allowed("format-webp|width-200"))
+
+    @override_settings(
+        GRAPPLE={
+            "ALLOWED_IMAGE_FILTERS": [
+                "fill-300x150|jpegquality-60",
+                {"width": range(100, 1001, 100), "format": ["webp", None]},
+            ]
+        }
+    )
+    def test_rendition_allowed_with_rules(self):
+        self.assertTrue(rendition_allowed("jpegquality-60|fill-300x150"))
+        self.assertTrue(rendition_allowed("width-200"))
+        self.assertTrue(rendition_allowed("format-webp|width-1000"))
+        self.assertFalse(rendition_allowed("width-250"))
+        self.assertFalse(rendition_allowed("width-1100"))
+        self.assertFalse(rendition_allowed("width-200|format-png"))
+        self.assertFalse(rendition_allowed("format-webp"))
+        self.assertFalse(rendition_allowed("width-200|height-100"))
+
+    def test_invalid_allowed_image_filters(self):
+        with override_settings(
+            GRAPPLE={"ALLOWED_IMAGE_FILTERS": [{"width": 100}]}
+        ), self.assertRaises(ImproperlyConfigured):
+            rendition_allowed("width-100")
+
+    def test_dedupe_renditions(self):
+        self.example_image.get_rendition("format-webp|width-100")
+        self.example_image.get_rendition("width-100|format-webp")
+        self.example_image.get_rendition("jpegquality-60|width-150")
+        self.example_image.get_rendition("width-50|fill-100x100")
+        self.example_image.get_rendition("fill-100x100|width-50")
+
+        call_command("grapple_dedupe_renditions", "--dry-run", stdout=StringIO())
+        self.assertEqual(self.example_image.renditions.count(), 5)
+
+        call_command("grapple_dedupe_renditions", stdout=StringIO())
+        self.assertEqual(
+            sorted(self.example_image.renditions.values_list("filter_spec", flat=True)),
+            [
+                "fill-100x100|width-50",
+                "width-100|format-webp",
+                "width-150|jpegquality-60",
+                "width-50|fill-100x100",
+            ],
+        )
+
+    def test_rendition_loader_batches_lookups(self):
+        images = [self.example_image] + [
+            wagtail_factories.ImageFactory(title=f"Image {i}") for i in range(3)
+        ]
+        for image in images:
+            image.get_rendition("fill-100x100")
+        images = list(Image.objects.filter(pk__in=[image.pk for image in images]))
+
+        loader = RenditionLoader()
+        loader.prime(image.pk for image in images)
+        with self.assertNumQueries(1):
+            renditions = [loader.get(image, "fill-100x100") for image in images]
+
+        self.assertEqual(
+            [rendition.image_id for rendition in renditions],
+            [image.pk for image in images],
+        )
+
+    def test_rendition_loader_fetches_several_specs_at_once(self):
+        filter_specs = ["width-100", "width-200", "width-300"]
+        # Wider than the renditions, as Wagtail does not upscale images.
+        image = wagtail_factories.ImageFactory(file__width=400, file__height=200)
+        image.get_renditions(*filter_specs)
+        image = Image.objects.get(pk=image.pk)
+
+        with self.assertNumQueries(1):
+            renditions = RenditionLoader().get_many(image, filter_specs)
+
+        self.assertEqual(
+            [renditions[filter_spec].width for filter_spec in filter_specs],
+            [100, 200, 300],
+        )
+
+    @override_settings(
+        GRAPPLE={
+            "RENDITION_ASYNC": True,
+            "RENDITION_ASYNC_BACKEND": "testapp.rendition_backends.RecordingRenditionBackend",
+        }
+    )
+    def test_async_rendition_generation(self):
+        RecordingRenditionBackend.queued = []
+        # Wider than the rendition, as Wagtail does not upscale images.
+        image = wagtail_factories.ImageFactory(file__width=400, file__height=200)
+        query = """
+        query ($id: ID!) {
+            image(id: $id) {
+                rendition(width: 123) {
+                    url
+                    width
+                    pending
+                }
+            }
+        }
+        """
+        data = self.client.execute(query, variables={"id": image.id})["data"]["image"][
+            "rendition"
+        ]
+
+        self.assertTrue(data["pending"])
+        self.assertEqual(data["width"], 123)
+        # The image serve view isn't routed in the tests, so the original is used.
+        self.assertEqual(data["url"], get_media_item_url(image))
+        self.assertEqual(RecordingRenditionBackend.queued, [(image.pk, "width-123")])
+        self.assertFalse(image.renditions.filter(filter_spec="width-123").exists())
+
+    @override_settings(GRAPPLE={"RENDITION_ASYNC_QUEUE_SIZE": 2})
+    def test_rendition_backend_queue_is_bounded(self):
+        backend = ProcessPoolRenditionBackend()
+        executor = mock.Mock()
+        executor.submit.side_effect = lambda *args: Future()
+
+        with mock.patch.object(backend, "_get_executor", return_value=executor):
+            for filter_spec in ["width-100", "width-100", "width-200", "width-300"]:
+                backend.enqueue(self.example_image.pk, filter_spec)
+
+        self.assertEqual(
+            [call.args[1:] for call in executor.submit.call_args_list],
+            [
+                (self.example_image.pk, "width-100"),
+                (self.example_image.pk, "width-200"),
+            ],
+        )
+
+    def test_images_without_renditions_skip_prefetch(self):
+        self.example_image.get_renditions("width-100", "width-200")
+
+        with self.assertNumQueries(1):
+            self.client.execute("{ images { id title } }")
+
+    def test_images_prefetch_selected_renditions(self):
+        # Wider than the renditions, as Wagtail does not upscale images.
+        image = wagtail_factories.ImageFactory(file__width=400, file__height=200)
+        for prefetched_image in (self.example_image, image):
+            prefetched_image.get_renditions("width-100", "width-200", "width-300")
+        query = """
+        query ($width: Int) {
+            images {
+                ...ImageParts
+            }
+        }
+        fragment ImageParts on CustomImage {
+            id
+            rendition(width: $width) {
+                width
+            }
+        }
+        """
+
+        with self.assertNumQueries(2):
+            executed = self.client.execute(query, variables={"width": 200})
+
+        widths = {
+            int(item["id"]): item["rendition"]["width"]
+            for item in executed["data"]["images"]
+        }
+        self.assertEqual(widths, {self.example_image.pk: 100, image.pk: 200})
+
+    def test_media_url_cache(self):
+        cache.clear()
+        CountingStorage.url_calls = 0
+        image = Image.objects.get(pk=self.example_image.pk)
+        image.file.storage = CountingStorage()
+
+        url = get_media_item_url(image)
+        self.assertEqual(get_media_item_url(image), url)
+        self.assertEqual(CountingStorage.url_calls, 2)
+
+        with override_settings(GRAPPLE={"MEDIA_URL_CACHE_TIMEOUT": 60}):
+            self.assertEqual(get_media_item_url(image), url)
+            self.assertEqual(get_media_item_url(image), url)
+            self.assertEqual(CountingStorage.url_calls, 3)
+
+            # A replaced file gets a new URL.
+            image.file_hash = "changed"
+            get_media_item_url(image)
+            self.assertEqual(CountingStorage.url_calls, 4)
+
+    def test_image_refs(self):
+        images = [self.example_image] + [
+            wagtail_factories.ImageFactory(title=f"Image {i}") for i in range(2)
+        ]
+        for image in images:
+            image.get_rendition("fill-100x100")
+        query = """
+        query ($ids: [ID!]) {
+            imageRefs(ids: $ids, order: "id") {
+                id
+                title
+                width
+                isSvg
+                renditionUrl(fill: "100x100")
+            }
+        }
+        """
+
+        # The images, then the renditions of all of them.
+        with self.assertNumQueries(2):
+            refs = self.client.execute(
+                query, variables={"ids": [image.pk for image in images]}
+            )["data"]["imageRefs"]
+
+        self.assertEqual(
+            [int(ref["id"]) for ref in refs], [image.pk for image in images]
+        )
+        self.assertEqual(refs[0]["title"], "Example Image")
+        self.assertFalse(refs[0]["isSvg"])
+        self.assertEqual(
+            refs[0]["renditionUrl"],
+            get_media_item_url(self.example_image.get_rendition("fill-100x100")),
+        )
+
+    def test_image_refs_of_missing_images(self):
+        info = SimpleNamespace(context=None, variable_values={})
+        # A dangling reference, as left by a deleted image.
+        page = BlogPage(hero_image_id=999999)
+
+        self.assertIsNone(get_instance_image_ref(info, page, page.hero_image_id))
+        self.assertIsNone(
+            ImageRefObjectType.resolve_rendition_url(999999, info, width=100)
+        )
+
+    def test_generate_renditions(self):
+        call_command(
+            "grapple_generate_renditions",
+            "--spec",
+            "width-50",
+            "--workers",
+            "0",
+            stdout=StringIO(),
+        )
+        self.assertTrue(
+            self.example_image.renditions.filter(filter_spec="width-50").exists()
+        )
+
+        stdout = StringIO()
+        call_command(
+            "grapple_generate_renditions",
+            "--spec",
+            "width-50",
+            "--workers",
+            "0",
+            stdout=stdout,
+        )
+        self.assertIn("Generated 0 renditions.", stdout.getvalue())
+
+    def test_collect_manifest_specs(self):
+        manifest = {
+            "operations": [
+                {
+                    "body": """
+                    query {
+                        images {
+                            rendition(format: "webp", width: 300) { url }
+                            srcSet(sizes: [100, 200])
+                            variable: rendition(width: $width) { url }
+                        }
+                    }
+                    """
+                }
+            ]
+        }
+        self.assertEqual(
+            collect_manifest_specs(manifest),
+            ["width-300|format-webp", "width-100", "width-200"],
+        )
+
+    def test_request_cache_is_kept_on_the_context(self):
+        request = RequestFactory().post("/graphql/")
+        info = SimpleNamespace(context=request)
+        other_info = SimpleNamespace(context=RequestFactory().post("/graphql/"))
+
+        self.assertIs(
+            get_request_cache(info, "renditions"),
+            get_request_cache(SimpleNamespace(context=request), "renditions"),
+        )
+        self.assertIsNot(
+            get_request_cache(info, "renditions"),
+            get_request_cache(other_info, "renditions"),
+        )
+        self.assertIsNot(
+            get_request_cache(SimpleNamespace(context=None), "renditions"),
+            get_request_cache(SimpleNamespace(context=None), "renditions"),
+        )
+
     def test_src_set_num_queries(self):
         sizes = [360, 720, 1024]
         filters = [f"width-{size}" for size in sizes]
@@ -322,6 +743,26 @@ class ImageTypesTestWithSVG(BaseGrappleTestWithIntrospection):
             .endswith("grapple-test.width-100.svg")
         )
 
+    def test_svg_image_sources(self):
+        query = """
+        query ($id: ID!) {
+            image(id: $id) {
+                imageSources(widths: [100], formats: ["avif", "webp"]) {
+                    format
+                    url
+                }
+            }
+        }
+        """
+
+        results = self.client.execute(
+            query, variables={"id": self.example_svg_image.id}
+        )
+        sources = results["data"]["image"]["imageSources"]
+        self.assertEqual(len(sources), 1)
+        self.assertIsNone(sources[0]["format"])
+        self.assertTrue(sources[0]["url"].endswith("grapple-test.width-100.svg"))
+
     def test_svg_rendition_with_raster_format_without_preserve_svg(self):
         query = """
         query ($id: ID!) {
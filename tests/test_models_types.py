@@ -1,13 +1,19 @@
 import graphene
 
 from django.test import TestCase
-from wagtail.blocks.field_block import PageChooserBlock
+from testapp.blocks import ImageGalleryImage
+from wagtail import blocks
+from wagtail.blocks.field_block import CharBlock, PageChooserBlock
 from wagtail.documents.blocks import DocumentChooserBlock
 from wagtail.images.blocks import ImageChooserBlock
 from wagtail.snippets.blocks import SnippetChooserBlock
 
 from grapple import registry
-from grapple.actions import get_field_type
+from grapple.actions import (
+    build_streamfield_resolver,
+    get_field_type,
+    streamfield_resolver,
+)
 from grapple.exceptions import IllegalDeprecation
 from grapple.models import (
     GraphQLCollection,
@@ -17,7 +23,17 @@ from grapple.models import (
     GraphQLStreamfield,
     GraphQLString,
 )
-from grapple.types.streamfield import StreamFieldInterface
+from grapple.types.interfaces import (
+    get_streamfield_block_type,
+    streamfield_block_types,
+)
+from grapple.types.streamfield import ListBlock as ListBlockType
+from grapple.types.streamfield import (
+    StreamFieldInterface,
+    StructBlockItem,
+    get_child_block_map,
+)
+from grapple.types.streamfield import StructBlock as StructBlockType
 from grapple.types.structures import BasePaginatedType, QuerySetList
 
 
@@ -243,3 +259,83 @@ class ChooserBlocksTest(TestCase):
         # Check that field is not required by asserting type isn't `NonNull`
         self.assertIsInstance(field, graphene.types.field.Field)
         self.assertNotIsInstance(field.type, graphene.NonNull)
+
+
+class StreamFieldBlockTypesTest(TestCase):
+    def test_block_types_are_precomputed(self):
+        """
+        Test that block classes used in model StreamFields resolve to their
+        registered type without walking the MRO.
+        """
+        self.assertIs(
+            streamfield_block_types[ImageGalleryImage],
+            registry.registry.streamfield_blocks[ImageGalleryImage],
+        )
+        self.assertIs(
+            streamfield_block_types[ImageChooserBlock],
+            registry.registry.streamfield_blocks[ImageChooserBlock],
+        )
+
+    def test_unregistered_block_type_falls_back_to_ancestor(self):
+        class CustomCharBlock(CharBlock):
+            pass
+
+        self.assertNotIn(CustomCharBlock, streamfield_block_types)
+        self.assertIs(
+            get_streamfield_block_type(CustomCharBlock),
+            registry.registry.streamfield_blocks[CharBlock],
+        )
+        self.assertIn(CustomCharBlock, streamfield_block_types)
+
+
+class StructBlockResolutionTest(TestCase):
+    def test_wide_struct_block_in_list_block(self):
+        """
+        Test that the children of a 50-field StructBlock nested in a ListBlock are
+        resolved in declaration order, with a child map computed once per block.
+        """
+        field_names = [f"field_{i}" for i in range(50)]
+        struct_block = blocks.StructBlock(
+            [(name, blocks.CharBlock()) for name in field_names]
+        )
+        list_block = blocks.ListBlock(struct_block)
+        value = list_block.to_python(
+            [{name: f"{name}-{row}" for name in field_names} for row in range(20)]
+        )
+
+        items = ListBlockType.resolve_items(
+            StructBlockItem("list", list_block, value), None
+        )
+        self.assertEqual(len(items), 20)
+
+        for row, item in enumerate(items):
+            children = StructBlockType.resolve_blocks(item, None)
+            self.assertEqual([child.id for child in children], field_names)
+            self.assertEqual(
+                [child.value for child in children],
+                [f"{name}-{row}" for name in field_names],
+            )
+
+        self.assertEqual(list(get_child_block_map(struct_block)), field_names)
+        self.assertIs(
+            get_child_block_map(struct_block), get_child_block_map(struct_block)
+        )
+
+
+class StreamFieldResolverTest(TestCase):
+    def test_resolver_is_compiled_for_child_blocks(self):
+        resolver = build_streamfield_resolver(ImageGalleryImage, "caption")
+        self.assertIsNot(resolver, streamfield_resolver)
+
+        block = ImageGalleryImage()
+        value = block.to_python({"caption": "A caption", "image": None})
+        self.assertEqual(
+            resolver(None, StructBlockItem("gallery", block, value), None),
+            "A caption",
+        )
+
+    def test_generic_resolver_for_other_fields(self):
+        self.assertIs(
+            build_streamfield_resolver(ImageGalleryImage, "not_a_block"),
+            streamfield_resolver,
+        )
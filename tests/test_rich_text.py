@@ -0,0 +1,264 @@
+import hashlib
+import json
+
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from test_grapple import BaseGrappleTest
+from testapp.factories import BlogPageFactory
+from wagtail.rich_text import RichText as WagtailRichText
+from wagtail_factories import ImageFactory
+
+from grapple.rich_text_ast import RichTextAST
+from grapple.types.rich_text import (
+    RichText,
+    RichTextRenderer,
+    build_rich_text_tree,
+    expand_rich_text_many,
+    invalidate_rich_text_trees,
+    load_rich_text_trees,
+    rendered_rich_text_cache,
+)
+
+
+@override_settings(GRAPPLE={"APPS": ["testapp"], "RICHTEXT_CACHE": True})
+class RichTextCacheTest(BaseGrappleTest):
+    def setUp(self):
+        super().setUp()
+        # Site root paths and cache versions are kept in the cache between tests.
+        cache.clear()
+        rendered_rich_text_cache.invalidate()
+        self.page = BlogPageFactory(slug="post", parent=self.home)
+        self.source = f'<p>A <a linktype="page" id="{self.page.pk}">link</a></p>'
+        BlogPageFactory(slug="linking", parent=self.home, summary=self.source)
+
+    def test_rendered_rich_text_is_cached(self):
+        html = RichText.serialize(self.source)
+        self.assertIn(f'href="{self.page.url}"', html)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(RichText.serialize(self.source), html)
+
+    def test_cache_invalidated_when_linked_page_changes(self):
+        RichText.serialize(self.source)
+
+        self.page.slug = "renamed"
+        self.page.save_revision().publish()
+
+        self.assertIn('href="/renamed/"', RichText.serialize(self.source))
+
+    def test_cache_kept_when_unlinked_objects_change(self):
+        html = RichText.serialize(self.source)
+
+        ImageFactory()
+        BlogPageFactory(slug="unlinked", parent=self.home).save_revision().publish()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(RichText.serialize(self.source), html)
+
+    @override_settings(GRAPPLE={"APPS": ["testapp"], "RICHTEXT_CACHE": False})
+    def test_cache_untouched_when_disabled(self):
+        with mock.patch.object(rendered_rich_text_cache, "invalidate") as invalidate:
+            self.page.slug = "renamed"
+            self.page.save_revision().publish()
+
+        invalidate.assert_not_called()
+
+    @override_settings(
+        GRAPPLE={"APPS": ["testapp"], "RICHTEXT_CACHE": True, "RICHTEXT_CACHE_SIZE": 2}
+    )
+    def test_local_cache_is_bounded(self):
+        for i in range(3):
+            RichText.serialize(f"<p>Paragraph {i}</p>")
+
+        self.assertEqual(len(rendered_rich_text_cache._get_data()), 2)
+
+        # Evicted entries are still served from the shared cache.
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                RichText.serialize("<p>Paragraph 0</p>"), "<p>Paragraph 0</p>"
+            )
+
+
+class RichTextBatchTest(BaseGrappleTest):
+    def setUp(self):
+        super().setUp()
+        self.pages = [
+            BlogPageFactory(slug=f"post-{i}", parent=self.home) for i in range(3)
+        ]
+        self.sources = [
+            f'<p>A <a linktype="page" id="{page.pk}">link</a></p>'
+            for page in self.pages
+        ]
+        # Warm the site root paths, so only link lookups are counted.
+        self.expected = [
+            str(WagtailRichText(source).__html__()) for source in self.sources
+        ]
+
+    def test_values_expanded_in_one_pass(self):
+        with CaptureQueriesContext(connection) as individual:
+            for source in self.sources:
+                WagtailRichText(source).__html__()
+
+        with CaptureQueriesContext(connection) as batched:
+            html = expand_rich_text_many(self.sources)
+
+        self.assertEqual(html, self.expected)
+        self.assertLess(len(batched), len(individual))
+
+    def test_values_containing_the_separator_are_rendered_one_by_one(self):
+        sources = [*self.sources, "<p>\x00</p>"]
+        self.assertEqual(
+            expand_rich_text_many(sources),
+            [*self.expected, str(WagtailRichText("<p>\x00</p>").__html__())],
+        )
+
+    def test_renderer_renders_primed_values_together(self):
+        renderer = RichTextRenderer()
+        renderer.prime(self.sources)
+
+        self.assertEqual(renderer.render(self.sources[0]), self.expected[0])
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                [renderer.render(source) for source in self.sources], self.expected
+            )
+
+
+@override_settings(GRAPPLE={"APPS": ["testapp"], "RICHTEXT_FORMAT": "ast"})
+class RichTextASTTest(BaseGrappleTest):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.linked_page = BlogPageFactory(slug="linked", parent=self.home)
+        self.source = f'<p>A <a linktype="page" id="{self.linked_page.pk}">link</a></p>'
+        self.page = BlogPageFactory(slug="post", parent=self.home, summary=self.source)
+
+    def test_build_rich_text_tree(self):
+        self.assertEqual(
+            build_rich_text_tree(
+                '<p>Some <b>bold</b> text<br/></p>\n<p><a href="/x/">A link</a></p>'
+            ),
+            [
+                {
+                    "type": "p",
+                    "children": [
+                        "Some ",
+                        {"type": "b", "children": ["bold"]},
+                        " text",
+                        {"type": "br"},
+                    ],
+                },
+                {
+                    "type": "p",
+                    "children": [
+                        {
+                            "type": "a",
+                            "attrs": {"href": "/x/"},
+                            "children": ["A link"],
+                        }
+                    ],
+                },
+            ],
+        )
+
+    def test_trees_are_stored_on_publish(self):
+        self.page.save_revision().publish()
+
+        source_hash = hashlib.sha256(self.source.encode()).hexdigest()
+        self.assertTrue(RichTextAST.objects.filter(source_hash=source_hash).exists())
+
+    def test_query_returns_tree_with_resolved_links(self):
+        self.page.save_revision().publish()
+        query = """
+        query($id: ID) {
+            page(id: $id) {
+                ... on BlogPage {
+                    summary
+                }
+            }
+        }
+        """
+        executed = self.client.execute(query, variables={"id": self.page.id})
+
+        self.assertEqual(
+            json.loads(executed["data"]["page"]["summary"]),
+            [
+                {
+                    "type": "p",
+                    "children": [
+                        "A ",
+                        {
+                            "type": "a",
+                            "attrs": {"href": self.linked_page.url},
+                            "children": ["link"],
+                        },
+                    ],
+                }
+            ],
+        )
+
+    def test_trees_are_removed_when_pages_change(self):
+        self.page.save_revision().publish()
+
+        self.linked_page.slug = "renamed"
+        self.linked_page.save_revision().publish()
+
+        self.assertIn('"/renamed/"', RichText.serialize(self.source))
+
+    def test_trees_of_unlinked_content_are_kept(self):
+        other_source = "<p>Unlinked</p>"
+        BlogPageFactory(slug="other", parent=self.home, summary=other_source)
+        load_rich_text_trees([self.source, other_source], store=True)
+
+        self.linked_page.slug = "renamed"
+        self.linked_page.save_revision().publish()
+
+        self.assertEqual(
+            set(RichTextAST.objects.values_list("source_hash", flat=True)),
+            {hashlib.sha256(other_source.encode()).hexdigest()},
+        )
+
+    def test_trees_built_during_an_invalidation_are_not_stored(self):
+        def expand_and_invalidate(sources):
+            html = expand_rich_text_many(sources)
+            invalidate_rich_text_trees()
+            return html
+
+        with mock.patch(
+            "grapple.types.rich_text.expand_rich_text_many",
+            side_effect=expand_and_invalidate,
+        ):
+            trees = load_rich_text_trees([self.source], store=True)
+
+        self.assertEqual(trees[self.source][0]["type"], "p")
+        self.assertFalse(RichTextAST.objects.exists())
+
+    def test_trees_built_on_request_are_not_stored(self):
+        trees = load_rich_text_trees([self.source])
+
+        self.assertEqual(trees[self.source][0]["type"], "p")
+        self.assertFalse(RichTextAST.objects.exists())
+
+    @override_settings(
+        GRAPPLE={
+            "APPS": ["testapp"],
+            "RICHTEXT_FORMAT": "ast",
+            "RICHTEXT_AST_STORE_ON_REQUEST": True,
+        }
+    )
+    def test_trees_built_on_request_are_stored_when_enabled(self):
+        load_rich_text_trees([self.source])
+
+        self.assertTrue(RichTextAST.objects.exists())
+
+    @override_settings(GRAPPLE={"APPS": ["testapp"], "RICHTEXT_FORMAT": "html"})
+    def test_trees_untouched_when_format_is_not_ast(self):
+        with mock.patch(
+            "grapple.signal_handlers.get_references_to"
+        ) as get_references_to:
+            self.linked_page.save_revision().publish()
+
+        get_references_to.assert_not_called()
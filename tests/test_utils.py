@@ -1,9 +1,14 @@
+from unittest import mock
+
 import wagtail_factories
 
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 from graphql import GraphQLError
+from wagtail.models import Site
+from wagtail.models.sites import get_site_for_hostname
 
-from grapple.utils import resolve_site_by_hostname, resolve_site_by_id
+from grapple.utils import resolve_site_by_hostname, resolve_site_by_id, site_table
 
 
 class TestResolveSiteById(TestCase):
@@ -104,3 +109,96 @@ class TestResolveSiteByHostname(TestCase):
                 hostname="example.com",
                 filter_name="hostname",
             )
+
+
+@override_settings(GRAPPLE={"SITE_CACHE": True})
+class TestSiteTable(TestCase):
+    """
+    Test suite for the in-process `grapple.utils.SiteTable`.
+    """
+
+    def setUp(self):
+        site_table.invalidate()
+        self.default_site = Site.objects.get(is_default_site=True)
+        self.site = wagtail_factories.SiteFactory(hostname="example.com", port=8000)
+        self.other_site = wagtail_factories.SiteFactory(
+            hostname="example.com", port=9000
+        )
+
+    def test_lookups_do_not_query(self):
+        """
+        Ensure site lookups are served from memory once the table is built.
+        """
+
+        resolve_site_by_id(id=self.site.pk)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(resolve_site_by_id(id=self.site.pk), self.site)
+            self.assertEqual(
+                resolve_site_by_hostname(
+                    hostname="example.com:9000", filter_name="hostname"
+                ),
+                self.other_site,
+            )
+            self.assertEqual(
+                site_table.get_by_id(self.site.pk).root_page.url_path,
+                self.site.root_page.url_path,
+            )
+
+    def test_graphqlerror_when_hostname_is_ambiguous(self):
+        with self.assertRaisesRegex(
+            GraphQLError, "Try including a port number to disambiguate"
+        ):
+            resolve_site_by_hostname(hostname="example.com", filter_name="hostname")
+
+    def test_version_key_is_kept_in_process(self):
+        site_table.get_by_id(self.site.pk)
+
+        with mock.patch.object(cache, "get", wraps=cache.get) as cache_get:
+            self.assertEqual(site_table.get_by_id(self.site.pk), self.site)
+        cache_get.assert_not_called()
+
+        with override_settings(
+            GRAPPLE={"SITE_CACHE": True, "CACHE_VERSION_TIMEOUT": 0}
+        ), mock.patch.object(cache, "get", wraps=cache.get) as cache_get:
+            site_table.get_by_id(self.site.pk)
+        cache_get.assert_called_once()
+
+    def test_invalidated_on_site_change(self):
+        """
+        Ensure the table is rebuilt when a `Site` is saved or deleted.
+        """
+
+        self.assertIsNone(
+            resolve_site_by_hostname(hostname="new.example.com", filter_name="site")
+        )
+
+        site = wagtail_factories.SiteFactory(hostname="new.example.com")
+        self.assertEqual(
+            resolve_site_by_hostname(hostname="new.example.com", filter_name="site"),
+            site,
+        )
+
+        site.delete()
+        self.assertIsNone(
+            resolve_site_by_hostname(hostname="new.example.com", filter_name="site")
+        )
+
+    def test_find_for_hostname_matches_wagtail(self):
+        """
+        Ensure hostname and port matching follows `Site.find_for_request`.
+        """
+
+        for hostname, port in [
+            ("example.com", 8000),
+            ("example.com", 9000),
+            ("example.com", 80),
+            (self.default_site.hostname, self.default_site.port),
+            ("unknown.example.com", 80),
+        ]:
+            with self.subTest(hostname=hostname, port=port):
+                try:
+                    expected = get_site_for_hostname(hostname, port)
+                except Site.DoesNotExist:
+                    expected = None
+                self.assertEqual(site_table.find_for_hostname(hostname, port), expected)
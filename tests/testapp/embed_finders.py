@@ -0,0 +1,38 @@
+import time
+
+from wagtail.embeds.exceptions import EmbedNotFoundException
+from wagtail.embeds.finders.base import EmbedFinder
+
+
+class LocalOEmbedFinder(EmbedFinder):
+    """
+    A stand-in for an oEmbed provider, answering for https://embed.test/ URLs
+    without any network access.
+
+    URLs ending in /slow/ take longer to answer than the tests' fetch timeout,
+    and URLs ending in /missing/ are not found.
+    """
+
+    requested_urls = []
+
+    def accept(self, url):
+        return url.startswith("https://embed.test/")
+
+    def find_embed(self, url, max_width=None, max_height=None):
+        type(self).requested_urls.append(url)
+
+        if url.endswith("/slow/"):
+            time.sleep(1)
+        if url.endswith("/missing/"):
+            raise EmbedNotFoundException
+
+        return {
+            "title": f"Embed for {url}",
+            "author_name": "",
+            "provider_name": "Local",
+            "type": "video",
+            "thumbnail_url": "",
+            "width": 640,
+            "height": 360,
+            "html": f'<iframe src="{url}"></iframe>',
+        }
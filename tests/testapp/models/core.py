@@ -30,6 +30,7 @@ from grapple.models import (
     GraphQLField,
     GraphQLForeignKey,
     GraphQLImage,
+    GraphQLImageRef,
     GraphQLMedia,
     GraphQLPage,
     GraphQLRichText,
@@ -174,6 +175,7 @@ class BlogPage(HeadlessPreviewMixin, Page):
             required=False,
         ),
         GraphQLStreamfield("body"),
+        GraphQLStreamfield("raw_body", source="body", raw=True),
         GraphQLTag("tags"),
         GraphQLCollection(
             GraphQLForeignKey,
@@ -192,6 +194,7 @@ class BlogPage(HeadlessPreviewMixin, Page):
         ),
         GraphQLSnippet("advert", "testapp.Advert"),
         GraphQLImage("hero_image"),
+        GraphQLImageRef("hero_image_ref", source="hero_image"),
         GraphQLDocument("book_file"),
         GraphQLMedia("featured_media"),
         GraphQLForeignKey("copy", "testapp.BlogPage"),
@@ -0,0 +1,10 @@
+class RecordingRenditionBackend:
+    """
+    A rendition backend recording the renditions it is asked to generate,
+    without generating them.
+    """
+
+    queued = []
+
+    def enqueue(self, image_id, filter_spec):
+        type(self).queued.append((image_id, filter_spec))